@@ -0,0 +1,453 @@
+# bench.py — offline benchmarks for the bot's hot paths (no token / network needed)
+
+# usage: python bench.py [ops] [name filter]
+
+# ops/s is measured without tracing; a second pass under tracemalloc gives the average per-call allocation high-water and the overall peak
+
+import os, sys, time, random, asyncio, tempfile, itertools, tracemalloc
+
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# main.py reads and creates its config files in the working directory; keep the checkout clean
+
+os.chdir(tempfile.mkdtemp(prefix="bot-bench-"))
+
+sys.path.insert(0, ROOT)
+
+import discord
+
+import main
+
+SEED = 1234
+
+WORDS = ["hello", "gg", "lol", "anyone", "raid", "tonight", "code", "review", "nice", "brb", "ok", "loot", "where", "map"]
+
+LEGACY_ALLOWED_ROLES = ["Staff", "Admin", "Moderator"]
+
+async def _noop(*args, **kwargs):
+
+    return None
+
+MESSAGE_IDS = itertools.count(1 << 40)
+
+def fake_message(content):
+
+    author = SimpleNamespace(id=42, bot=False, guild_permissions=SimpleNamespace(manage_messages=True, manage_guild=False), roles=[SimpleNamespace(id=7, name="Member")])
+
+    channel = SimpleNamespace(id=99, send=_noop)
+
+    return SimpleNamespace(content=content, author=author, channel=channel, guild=None, reference=None, delete=_noop, id=next(MESSAGE_IDS), attachments=[], _state=main.bot._connection)
+
+# cumulative shares of (plain chatter, "!" commands, CODE alerts); the rest are CODE look-alikes
+
+MIXES = {
+
+    "default": (0.90, 0.95, 0.98),
+
+    "chatter": (0.99, 0.995, 0.998),
+
+    "commands": (0.60, 0.80, 0.95)
+
+}
+
+def message_mix(n, seed=SEED, mix="default"):
+
+    # fixed-seed chat traffic: mostly plain chatter, a few commands, CODE alerts and CODE look-alikes
+
+    rng = random.Random(seed)
+
+    chatter, commands, codes = MIXES[mix]
+
+    out = []
+
+    for _ in range(n):
+
+        r = rng.random()
+
+        if r < chatter:
+
+            out.append(" ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 20))))
+
+        elif r < commands:
+
+            out.append("!benchnoop")
+
+        elif r < codes:
+
+            out.append(f"CODE {rng.choice(list(main.CODE_MEANINGS))} : meet at :base now")
+
+        else:
+
+            out.append("code " + " ".join(rng.choice(WORDS) for _ in range(5)))
+
+    return [fake_message(c) for c in out]
+
+def code_messages(n, seed=SEED):
+
+    # CODE alerts only, half with a note
+
+    rng = random.Random(seed)
+
+    out = []
+
+    for _ in range(n):
+
+        code = rng.choice(list(main.CODE_MEANINGS))
+
+        out.append(f"CODE {code} : meet at :base now" if rng.random() < 0.5 else f"code {code.lower()}")
+
+    return [fake_message(c) for c in out]
+
+# real discord.py Guild/Member objects, built from gateway-shaped payloads
+
+GUILD_IDS = itertools.count(1 << 41)
+
+USER_IDS = itertools.count(1 << 42)
+
+STAFF_ROLE_NAMES = ["Staff", "Admin", "Moderator"]
+
+def role_payload(role_id, name, position):
+
+    return {"id": role_id, "name": name, "permissions": "0", "position": position, "color": 0, "hoist": False, "managed": False, "mentionable": False}
+
+def fake_guild(role_count, member_count, roles_per_member=1):
+
+    guild_id = next(GUILD_IDS)
+
+    # @everyone shares the guild id; the staff roles come first so every role count includes them
+
+    names = ["@everyone"] + STAFF_ROLE_NAMES + [f"role-{i}" for i in range(max(0, role_count - 4))]
+
+    roles = [role_payload(guild_id + i, name, i) for i, name in enumerate(names)]
+
+    channel = {"id": guild_id + 100000, "type": 0, "name": "welcome", "position": 0, "permission_overwrites": []}
+
+    guild = discord.Guild(data={"id": guild_id, "name": "Bench Guild", "owner_id": 1, "member_count": member_count, "roles": roles, "channels": [channel]}, state=main.bot._connection)
+
+    # a cached member list, like a guild chunked with the members intent
+
+    for member in fake_members(guild, member_count, roles_per_member):
+
+        guild._add_member(member)
+
+    return guild
+
+def fake_member(guild, role_ids):
+
+    user = {"id": next(USER_IDS), "username": "bench", "discriminator": "0", "avatar": None}
+
+    return discord.Member(data={"user": user, "roles": role_ids, "joined_at": None, "deaf": False, "mute": False, "flags": 0}, guild=guild, state=main.bot._connection)
+
+def fake_members(guild, n, roles_per_member, seed=SEED):
+
+    # about one member in ten holds a staff role
+
+    rng = random.Random(seed)
+
+    role_ids = [r.id for r in guild.roles[1:]]
+
+    staff_ids = role_ids[:len(STAFF_ROLE_NAMES)]
+
+    plain_ids = role_ids[len(STAFF_ROLE_NAMES):] or staff_ids
+
+    out = []
+
+    for _ in range(n):
+
+        picked = rng.sample(plain_ids, min(roles_per_member, len(plain_ids)))
+
+        if rng.random() < 0.1:
+
+            picked[0] = rng.choice(staff_ids)
+
+        out.append(fake_member(guild, picked))
+
+    return out
+
+def fake_log_channel():
+
+    # a cached text channel, so bot.get_channel(LOG_CHANNEL_ID) finds it and batches reach the stubbed send
+
+    guild = fake_guild(1, 0)
+
+    main.bot._connection._add_guild(guild)
+
+    return guild.text_channels[0]
+
+async def legacy_on_message(message):
+
+    # the pre-dispatcher handler: upper() of every message and process_commands for everything
+
+    if message.author.bot:
+
+        return
+
+    if message.content.startswith("!"):
+
+        try:
+
+            await message.delete()
+
+        except:
+
+            pass
+
+    content_up = message.content.upper()
+
+    if content_up.startswith("CODE "):
+
+        parts = message.content.split(":", 1)
+
+        code_part = parts[0].strip().replace("CODE ", "").upper()
+
+        note = parts[1].strip() if len(parts) > 1 else None
+
+        if code_part in main.CODE_MEANINGS:
+
+            has_perm = message.author.guild_permissions.manage_messages
+
+            for r in message.author.roles:
+
+                if r.name in LEGACY_ALLOWED_ROLES:
+
+                    has_perm = True
+
+                    break
+
+            if has_perm:
+
+                meaning, color, emoji = main.CODE_MEANINGS[code_part]
+
+                embed = discord.Embed(title=f"{emoji} CODE {code_part}", description=meaning, color=color)
+
+                if note:
+
+                    words = note.split()
+
+                    formatted = [f"**{w[1:]}**" if w.startswith(":") else w for w in words]
+
+                    embed.add_field(name="📝 Note", value=" ".join(formatted), inline=False)
+
+                await message.delete()
+
+                await message.channel.send(embed=embed)
+
+    await main.bot.process_commands(message)
+
+async def run_handler(handler, messages):
+
+    started = time.perf_counter()
+
+    for m in messages:
+
+        await handler(m)
+
+    return len(messages) / (time.perf_counter() - started)
+
+def sent_message_payload(channel_id, **kwargs):
+
+    # what discord answers to POST /channels/{id}/messages; discord.py builds a Message from it
+
+    return {"id": next(MESSAGE_IDS), "channel_id": channel_id, "author": {"id": 1, "username": "bot", "discriminator": "0", "avatar": None, "bot": True},
+
+            "content": "", "timestamp": "2024-01-01T00:00:00+00:00", "edited_timestamp": None, "tts": False, "mention_everyone": False,
+
+            "mentions": [], "mention_roles": [], "attachments": [], "embeds": [], "pinned": False, "type": 0}
+
+async def fake_send_message(channel_id, **kwargs):
+
+    return sent_message_payload(channel_id)
+
+def setup_bot():
+
+    # enough client state for process_commands to build contexts offline
+
+    main.bot._connection.user = SimpleNamespace(id=1)
+
+    # sends to real channel objects (welcome messages, log batches) end at the REST client
+
+    main.bot.http.send_message = fake_send_message
+
+    # queued deletes are flushed through the REST client; keep them offline
+
+    main.bot.http.delete_message = _noop
+
+    # every fake message shares one channel; lift its send limit so the scheduler never sleeps
+
+    main.outbound.rate = 10 ** 9
+
+    @main.bot.command(name="benchnoop")
+
+    async def benchnoop(ctx):
+
+        pass
+
+async def bench_dispatch(n):
+
+    messages = message_mix(n)
+
+    # warm up both paths once so imports/caches don't count
+
+    await run_handler(legacy_on_message, messages[:200])
+
+    await run_handler(main.on_message, messages[:200])
+
+    before = await run_handler(legacy_on_message, messages)
+
+    after = await run_handler(main.on_message, messages)
+
+    print(f"on_message dispatch ({n} msgs, seed {SEED})")
+
+    print(f"  before (upper + process_commands): {before:12,.0f} msg/s")
+
+    print(f"  after  (prefix table fast path):   {after:12,.0f} msg/s")
+
+    print(f"  speedup: {after / before:.1f}x")
+
+# ----------------- SUITE -----------------
+
+async def run_calls(call, args):
+
+    # one loop turn per call, like one gateway event each; lets tasks the call schedules (log flushes) run
+
+    started = time.perf_counter()
+
+    for a in args:
+
+        await call(a)
+
+        await asyncio.sleep(0)
+
+    return time.perf_counter() - started
+
+async def trace_calls(call, args):
+
+    # per-call allocation high-water: the peak is reset before each call and read right after it
+
+    tracemalloc.start()
+
+    base, _ = tracemalloc.get_traced_memory()
+
+    allocated = high = 0
+
+    for a in args:
+
+        current, _ = tracemalloc.get_traced_memory()
+
+        tracemalloc.reset_peak()
+
+        await call(a)
+
+        _, peak = tracemalloc.get_traced_memory()
+
+        allocated += peak - current
+
+        high = max(high, peak - base)
+
+        await asyncio.sleep(0)
+
+    tracemalloc.stop()
+
+    return allocated / len(args), high
+
+async def measure(name, call, make_args):
+
+    args = make_args()
+
+    await run_calls(call, args[:200])
+
+    elapsed = await run_calls(call, args)
+
+    # second pass on fresh inputs under tracemalloc (which slows everything down, so it isn't timed)
+
+    args = make_args()
+
+    allocated, peak = await trace_calls(call, args)
+
+    n = len(args)
+
+    print(f"  {name:<44} {n / elapsed:>12,.0f} {elapsed / n * 1e6:>9.2f} {allocated:>12,.0f} {peak / 1024:>10,.0f}")
+
+def suite(n):
+
+    # (name, coroutine taking one input, input factory); factories are fixed-seed so runs are comparable
+
+    cases = []
+
+    for mix in MIXES:
+
+        cases.append((f"on_message [{mix} mix]", main.on_message, lambda mix=mix: message_mix(n, mix=mix)))
+
+    cases.append(("CODE parse + embed", main.handle_code_message, lambda: code_messages(n)))
+
+    for role_count, roles_per_member in ((20, 2), (100, 5), (250, 10)):
+
+        guild = fake_guild(role_count, 5000, roles_per_member)
+
+        members = list(guild.members)[:2000]
+
+        # cycles over a member pool of mixed staff and non-staff members
+
+        pool = lambda guild=guild, members=members: [(guild, members[i % len(members)]) for i in range(n)]
+
+        cases.append((f"is_staff [{role_count} roles, {roles_per_member}/member]", lambda a: main.is_staff(*a), pool))
+
+    log_actions = list(main.LOG_COLORS)
+
+    def log_args():
+
+        rng = random.Random(SEED)
+
+        return [(rng.choice(log_actions), f"[bench] event {i} " + " ".join(rng.choice(WORDS) for _ in range(8))) for i in range(n)]
+
+    cases.append(("send_log [queued to log channel]", lambda a: main.send_log(a[1], action=a[0]), log_args))
+
+    for member_count in (1000, 50000):
+
+        guild = fake_guild(20, member_count)
+
+        main.guild_settings.save(guild.id, dict(main.guild_cfg(guild), welcome_channel_id=guild.text_channels[0].id))
+
+        joins = lambda guild=guild: fake_members(guild, n, 1)
+
+        cases.append((f"on_member_join [{member_count:,} members]", main.on_member_join, joins))
+
+    return cases
+
+async def bench_suite(n, only=None):
+
+    # every log entry goes to a real channel; the flusher batches them as it would live
+
+    main.LOG_CHANNEL_ID = fake_log_channel().id
+
+    # join bursts would otherwise collapse into a few batched messages after the first five
+
+    main.member_announcer.threshold = 10 ** 9
+
+    print(f"\nsuite ({n} ops per case, seed {SEED})")
+
+    print(f"  {'case':<44} {'ops/s':>12} {'us/op':>9} {'alloc B/op':>12} {'peak KiB':>10}")
+
+    for name, call, make_args in suite(n):
+
+        if only is None or only in name:
+
+            await measure(name, call, make_args)
+
+async def bench_all(n, only=None):
+
+    if only is None or "dispatch" in only:
+
+        await bench_dispatch(n)
+
+    await bench_suite(n, only)
+
+if __name__ == "__main__":
+
+    setup_bot()
+
+    asyncio.run(bench_all(int(sys.argv[1]) if len(sys.argv) > 1 else 50000, sys.argv[2] if len(sys.argv) > 2 else None))
+
+    os._exit(0)
\ No newline at end of file
@@ -0,0 +1,165 @@
+# launcher.py — runs the bot as several worker processes on this machine, each owning a range of shards
+
+# usage: python launcher.py [workers]   (run from the bot's working directory: token.txt, config.json, settings.db)
+
+import os, sys, json, math, time, signal, subprocess, urllib.request
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+BOT_SCRIPT = os.path.join(ROOT, "main.py")
+
+# discord allows max_concurrency IDENTIFYs per 5 seconds
+
+IDENTIFY_WINDOW = 5.0
+
+RESPAWN_DELAY = 10.0
+
+def read_file(path):
+
+    try:
+
+        with open(path, "r") as f:
+
+            return f.read().strip()
+
+    except:
+
+        return None
+
+def read_config():
+
+    try:
+
+        return json.loads(read_file("config.json") or "{}")
+
+    except ValueError:
+
+        return {}
+
+def gateway_info(token):
+
+    # recommended shard count and identify concurrency for this token
+
+    req = urllib.request.Request("https://discord.com/api/v10/gateway/bot", headers={"Authorization": f"Bot {token}", "User-Agent": "DiscordBot (launcher.py, 1.0)"})
+
+    with urllib.request.urlopen(req, timeout=15) as resp:
+
+        return json.load(resp)
+
+def shard_ranges(shard_count, workers):
+
+    # contiguous, as even as possible
+
+    per, extra = divmod(shard_count, workers)
+
+    ranges, start = [], 0
+
+    for i in range(workers):
+
+        size = per + (1 if i < extra else 0)
+
+        ranges.append(list(range(start, start + size)))
+
+        start += size
+
+    return ranges
+
+def spawn(cluster_id, shard_ids, shard_count):
+
+    env = dict(os.environ, BOT_CLUSTER_ID=str(cluster_id), BOT_SHARD_IDS=",".join(map(str, shard_ids)), BOT_SHARD_COUNT=str(shard_count))
+
+    print(f"▶️ Worker {cluster_id}: shards {shard_ids[0]}-{shard_ids[-1]} of {shard_count}")
+
+    return subprocess.Popen([sys.executable, BOT_SCRIPT], env=env)
+
+def main():
+
+    token = read_file("token.txt")
+
+    if not token:
+
+        print("❌ No token found in token.txt")
+
+        return
+
+    config = read_config()
+
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else config.get("cluster_workers", 2)
+
+    info = gateway_info(token)
+
+    concurrency = info["session_start_limit"]["max_concurrency"]
+
+    # at least one shard per worker; discord accepts more shards than it recommends
+
+    shard_count = max(config.get("shard_count") or info["shards"], workers)
+
+    ranges = shard_ranges(shard_count, workers)
+
+    stopping = []
+
+    def stop(signum, frame):
+
+        stopping.append(signum)
+
+    signal.signal(signal.SIGTERM, stop)
+
+    signal.signal(signal.SIGINT, stop)
+
+    procs = {}
+
+    for cluster_id, shard_ids in enumerate(ranges):
+
+        if stopping:
+
+            break
+
+        procs[cluster_id] = spawn(cluster_id, shard_ids, shard_count)
+
+        # let this worker identify its shards before the next one starts on the same limit
+
+        if cluster_id < len(ranges) - 1:
+
+            time.sleep(IDENTIFY_WINDOW * math.ceil(len(shard_ids) / concurrency))
+
+    respawn_at = {}
+
+    while not stopping:
+
+        now = time.monotonic()
+
+        for cluster_id, proc in procs.items():
+
+            code = proc.poll()
+
+            if code is None:
+
+                continue
+
+            if cluster_id not in respawn_at:
+
+                print(f"⚠️ Worker {cluster_id} exited with code {code}; restarting in {RESPAWN_DELAY:.0f}s")
+
+                respawn_at[cluster_id] = now + RESPAWN_DELAY
+
+            elif now >= respawn_at[cluster_id]:
+
+                del respawn_at[cluster_id]
+
+                procs[cluster_id] = spawn(cluster_id, ranges[cluster_id], shard_count)
+
+        time.sleep(1)
+
+    for proc in procs.values():
+
+        if proc.poll() is None:
+
+            proc.terminate()
+
+    for proc in procs.values():
+
+        proc.wait()
+
+if __name__ == "__main__":
+
+    main()
\ No newline at end of file
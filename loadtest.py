@@ -0,0 +1,795 @@
+# loadtest.py — local stand-in for Discord's REST API and gateway that replays event traces into the real bot
+
+# usage: python loadtest.py [--rate 20] [--duration 60] [--speed 1] [--trace FILE] [--record FILE] [--chaos 0.02]
+
+# then start the bot against it (any token in token.txt) with these keys in config.json:
+
+#   "api_base": "http://127.0.0.1:8765/api/v10", "gateway_url": "ws://127.0.0.1:8765/gateway"
+
+# run it from the bot's working directory so the log channel (channel_id.txt) exists in the fake guild
+
+import re, json, time, random, asyncio, argparse, itertools
+
+from collections import Counter, defaultdict, deque
+
+from datetime import datetime, timezone
+
+from aiohttp import web, WSMsgType
+
+SEED = 1234
+
+HEARTBEAT_INTERVAL = 41250
+
+# CODE_MEANINGS in main.py
+
+CODES = ["BLUE", "RED", "GREEN", "YELLOW", "ORANGE", "PURPLE", "BLACK"]
+
+COMMANDS = ["!help", "!notifier", "!publicstatus", "!config"]
+
+WORDS = ["hello", "gg", "lol", "anyone", "raid", "tonight", "code", "review", "nice", "brb", "ok", "loot", "where", "map"]
+
+# synthetic event mix: (kind, share)
+
+KINDS = (("chatter", 0.80), ("command", 0.05), ("code", 0.10), ("join", 0.05))
+
+# replies carry their event's marker: CODE notes render ":lt0000012" as "**lt0000012**", welcomes mention the new member
+
+MARKER = re.compile(r"lt(\d{7})|<@!?(\d+)>")
+
+ROUTE_IDS = re.compile(r"/\d{5,}")
+
+ROUTE_TOKENS = re.compile(r"/(interactions|webhooks)/\{id\}/[^/]+")
+
+MAJOR = re.compile(r"^/(?:channels|guilds|webhooks|interactions)/(\d+)")
+
+# discord's epoch (2015-01-01) in ms; ids carry their creation time, and discord.py dates messages by it
+
+DISCORD_EPOCH = 1420070400000
+
+SNOWFLAKE_SEQUENCE = itertools.count()
+
+def snowflake():
+
+    # time-based like discord's own ids, so messages are fresh enough (under 14 days) for the bot to bulk-delete
+
+    return ((int(time.time() * 1000) - DISCORD_EPOCH) << 22) | (next(SNOWFLAKE_SEQUENCE) & 0x3fffff)
+
+def now_iso():
+
+    return datetime.now(timezone.utc).isoformat()
+
+def json_response(payload, status, headers):
+
+    # discord.py only parses bodies whose content-type is exactly application/json (no charset)
+
+    return web.Response(body=json.dumps(payload).encode(), status=status, headers=dict(headers, **{"Content-Type": "application/json"}))
+
+def percentile(values, pct):
+
+    if not values:
+
+        return 0.0
+
+    ordered = sorted(values)
+
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def synthetic_trace(rate, duration, channels, seed=SEED):
+
+    # fixed-seed poisson arrivals at `rate` events/s
+
+    rng = random.Random(seed)
+
+    at, out = 0.0, []
+
+    while True:
+
+        at += rng.expovariate(rate)
+
+        if at >= duration:
+
+            return out
+
+        r, kind = rng.random(), KINDS[-1][0]
+
+        for name, share in KINDS:
+
+            if r < share:
+
+                kind = name
+
+                break
+
+            r -= share
+
+        event = {"at": round(at, 4), "kind": kind, "user": rng.randrange(1, 5000), "channel": rng.randrange(channels), "staff": kind == "code"}
+
+        if kind == "chatter":
+
+            event["content"] = " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 20)))
+
+        elif kind == "command":
+
+            event["content"] = rng.choice(COMMANDS)
+
+        elif kind == "code":
+
+            event["content"] = f"CODE {rng.choice(CODES)} : meet at :base now"
+
+        out.append(event)
+
+def load_trace(path):
+
+    # one event per line: {"at": seconds, "kind": chatter|command|code|join, "content", "user", "channel", "staff"}
+
+    with open(path) as f:
+
+        return [json.loads(line) for line in f if line.strip()]
+
+class FakeDiscord:
+
+    def __init__(self, args):
+
+        self.args = args
+
+        self.rng = random.Random(SEED)
+
+        self.base_url = f"http://{args.host}:{args.port}"
+
+        self.bot = self.user(snowflake(), "loadtest-bot", bot=True)
+
+        self.staff = self.user(snowflake(), "loadtest-staff")
+
+        self.app_id = snowflake()
+
+        self.guild_id = snowflake()
+
+        # allowed_roles defaults to role names; "Staff" is one of them
+
+        self.staff_role = snowflake()
+
+        self.chat = [snowflake() for _ in range(args.channels)]
+
+        self.welcome = snowflake()
+
+        self.log_channel = args.log_channel
+
+        self.members = {}
+
+        for user, roles in ((self.bot, []), (self.staff, [self.staff_role])):
+
+            self.members[user["id"]] = self.member(user, roles)
+
+        self.ws = None
+
+        self.seq = 0
+
+        self.identified = asyncio.Event()
+
+        self.setup_done = asyncio.Event()
+
+        self.setup_interaction = None
+
+        self.buckets = {}
+
+        self.global_window = [0, time.monotonic()]
+
+        self.counting = False
+
+        self.calls = Counter()
+
+        self.statuses = Counter()
+
+        self.served_429 = Counter()
+
+        self.sent = Counter()
+
+        self.dropped = 0
+
+        self.pending = {}
+
+        self.untagged = defaultdict(deque)
+
+        self.latencies = defaultdict(list)
+
+        self.log_posts = 0
+
+        self.log_embeds = 0
+
+    # ----------------- payloads -----------------
+
+    @staticmethod
+
+    def user(user_id, name, bot=False):
+
+        return {"id": str(user_id), "username": name, "discriminator": "0", "global_name": None, "avatar": None, "bot": bot}
+
+    @staticmethod
+
+    def member(user, roles):
+
+        return {"user": user, "roles": [str(r) for r in roles], "joined_at": now_iso(), "deaf": False, "mute": False, "flags": 0}
+
+    def channel(self, channel_id):
+
+        names = {self.welcome: "welcome", self.log_channel: "bot-logs"}
+
+        name = names.get(channel_id) or f"chat-{self.chat.index(channel_id)}"
+
+        return {"id": str(channel_id), "type": 0, "guild_id": str(self.guild_id), "name": name, "position": 0, "permission_overwrites": [], "nsfw": False, "parent_id": None}
+
+    def channel_ids(self):
+
+        return self.chat + [self.welcome] + ([self.log_channel] if self.log_channel else [])
+
+    def roles(self):
+
+        role = lambda role_id, name, position: {"id": str(role_id), "name": name, "permissions": "0", "position": position, "color": 0, "hoist": False, "managed": False, "mentionable": False}
+
+        return [role(self.guild_id, "@everyone", 0), role(self.staff_role, "Staff", 1)]
+
+    def guild(self, members=True):
+
+        data = {"id": str(self.guild_id), "name": "Load Test", "icon": None, "owner_id": self.staff["id"], "roles": self.roles(), "emojis": [], "stickers": [], "features": [],
+
+                "member_count": len(self.members), "large": False, "unavailable": False, "premium_tier": 0, "preferred_locale": "en-US", "verification_level": 0,
+
+                "default_message_notifications": 0, "explicit_content_filter": 0, "mfa_level": 0, "nsfw_level": 0, "system_channel_flags": 0}
+
+        if members:
+
+            data.update(channels=[self.channel(c) for c in self.channel_ids()], members=list(self.members.values()), threads=[], voice_states=[], presences=[],
+
+                        stage_instances=[], guild_scheduled_events=[], joined_at=now_iso())
+
+        return data
+
+    def application(self):
+
+        return {"id": str(self.app_id), "name": "loadtest", "icon": None, "description": "", "summary": "", "rpc_origins": [], "bot_public": True,
+
+                "bot_require_code_grant": False, "owner": self.staff, "verify_key": "0", "flags": 0}
+
+    def message(self, channel_id, author, content="", data=None):
+
+        msg = {"id": str(snowflake()), "channel_id": str(channel_id), "author": author, "content": content, "timestamp": now_iso(), "edited_timestamp": None,
+
+               "tts": False, "mention_everyone": False, "mentions": [], "mention_roles": [], "attachments": [], "embeds": [], "pinned": False, "type": 0}
+
+        if data:
+
+            msg.update(embeds=data.get("embeds") or [], components=data.get("components") or [])
+
+        return msg
+
+    # ----------------- gateway -----------------
+
+    async def dispatch(self, event, data):
+
+        if self.ws is None or self.ws.closed:
+
+            return False
+
+        self.seq += 1
+
+        await self.ws.send_str(json.dumps({"op": 0, "t": event, "s": self.seq, "d": data}))
+
+        return True
+
+    async def gateway(self, request):
+
+        ws = web.WebSocketResponse(max_msg_size=0)
+
+        await ws.prepare(request)
+
+        self.ws = ws
+
+        await ws.send_str(json.dumps({"op": 10, "d": {"heartbeat_interval": HEARTBEAT_INTERVAL}, "s": None, "t": None}))
+
+        async for msg in ws:
+
+            if msg.type != WSMsgType.TEXT:
+
+                continue
+
+            frame = json.loads(msg.data)
+
+            op = frame.get("op")
+
+            if op == 1:
+
+                await ws.send_str(json.dumps({"op": 11, "d": None, "s": None, "t": None}))
+
+            elif op == 2:
+
+                self.seq = 0
+
+                ready = {"v": 10, "user": dict(self.bot, verified=True, mfa_enabled=False, flags=0), "guilds": [{"id": str(self.guild_id), "unavailable": True}],
+
+                         "session_id": f"loadtest-{snowflake()}", "resume_gateway_url": f"ws://{self.args.host}:{self.args.port}/gateway",
+
+                         "application": {"id": str(self.app_id), "flags": 0}, "private_channels": [], "relationships": []}
+
+                await self.dispatch("READY", ready)
+
+                await self.dispatch("GUILD_CREATE", self.guild())
+
+                self.identified.set()
+
+            elif op == 6:
+
+                # sessions never expire here; nothing was missed that needs replaying
+
+                await self.dispatch("RESUMED", {})
+
+            elif op == 8:
+
+                chunk = {"guild_id": str(self.guild_id), "members": list(self.members.values()), "chunk_index": 0, "chunk_count": 1, "nonce": frame["d"].get("nonce")}
+
+                await self.dispatch("GUILD_MEMBERS_CHUNK", chunk)
+
+        if self.ws is ws:
+
+            self.ws = None
+
+        return ws
+
+    # ----------------- REST -----------------
+
+    def rate_limit(self, method, route, major):
+
+        # discord-style per-route buckets, a global per-second limit and optional random 429s
+
+        now = time.monotonic()
+
+        if self.args.chaos and self.rng.random() < self.args.chaos:
+
+            return {"X-RateLimit-Scope": "shared"}, 0.5, False
+
+        window = self.global_window
+
+        if now - window[1] >= 1:
+
+            window[:] = [0, now]
+
+        window[0] += 1
+
+        if window[0] > self.args.global_limit:
+
+            return {"X-RateLimit-Global": "true", "X-RateLimit-Scope": "global"}, 1 - (now - window[1]), True
+
+        bucket = self.buckets.get((method, route, major))
+
+        if bucket is None or now >= bucket[1]:
+
+            bucket = self.buckets[(method, route, major)] = [self.args.limit, now + self.args.per]
+
+        reset_after = bucket[1] - now
+
+        headers = {"X-RateLimit-Limit": str(self.args.limit), "X-RateLimit-Remaining": str(max(0, bucket[0] - 1)), "X-RateLimit-Reset": f"{time.time() + reset_after:.3f}",
+
+                   "X-RateLimit-Reset-After": f"{reset_after:.3f}", "X-RateLimit-Bucket": f"{hash((method, route)) & 0xffffffff:08x}"}
+
+        if bucket[0] <= 0:
+
+            headers.update({"X-RateLimit-Remaining": "0", "X-RateLimit-Scope": "user"})
+
+            return headers, reset_after, False
+
+        bucket[0] -= 1
+
+        return headers, None, False
+
+    async def rest(self, request):
+
+        path = "/" + request.match_info["tail"]
+
+        route = ROUTE_TOKENS.sub(r"/\1/{id}/{token}", ROUTE_IDS.sub("/{id}", path))
+
+        major = MAJOR.match(path)
+
+        major = major.group(1) if major else None
+
+        body = await request.text()
+
+        if self.counting:
+
+            self.calls[f"{request.method} {route}"] += 1
+
+        headers, retry_after, is_global = self.rate_limit(request.method, route, major)
+
+        if retry_after is not None:
+
+            if self.counting:
+
+                self.served_429[f"{request.method} {route}"] += 1
+
+            # discord.py treats a 429 without Via as a cloudflare ban
+
+            headers.update({"Retry-After": f"{retry_after:.3f}", "Via": "1.1 google"})
+
+            return json_response({"message": "You are being rate limited.", "retry_after": round(retry_after, 3), "global": is_global}, 429, headers)
+
+        status, payload = self.handle(request.method, route, path, major, body)
+
+        if self.counting:
+
+            self.statuses[status] += 1
+
+        if payload is None:
+
+            return web.Response(status=status, headers=headers)
+
+        return json_response(payload, status, headers)
+
+    def handle(self, method, route, path, major, body):
+
+        data = json.loads(body) if body.startswith("{") else {}
+
+        if route == "/users/@me":
+
+            return 200, dict(self.bot, verified=True, mfa_enabled=False, flags=0)
+
+        if route == "/oauth2/applications/@me":
+
+            return 200, self.application()
+
+        if route in ("/gateway", "/gateway/bot"):
+
+            return 200, {"url": f"ws://{self.args.host}:{self.args.port}/gateway", "shards": 1, "session_start_limit": {"total": 1000, "remaining": 1000, "reset_after": 0, "max_concurrency": 1}}
+
+        if route == "/applications/{id}/commands":
+
+            return 200, []
+
+        if method == "POST" and route == "/channels/{id}/messages":
+
+            self.received(int(major), body)
+
+            return 200, self.message(major, self.bot, data.get("content") or "", data)
+
+        if method == "POST" and route == "/webhooks/{id}/{token}":
+
+            self.received(None, body)
+
+            return 200, self.message(self.chat[0], self.bot, data.get("content") or "", data)
+
+        if method == "POST" and route == "/interactions/{id}/{token}/callback":
+
+            if major == self.setup_interaction:
+
+                self.setup_done.set()
+
+            else:
+
+                self.received(None, body)
+
+            message = self.message(self.welcome, self.bot, (data.get("data") or {}).get("content") or "", data.get("data"))
+
+            return 200, {"interaction": {"id": major, "type": 3, "response_message_id": message["id"], "response_message_loading": False, "response_message_ephemeral": True},
+
+                         "resource": {"type": data.get("type", 4), "message": message}}
+
+        if (method, route) in (("DELETE", "/channels/{id}/messages/{id}"), ("POST", "/channels/{id}/messages/bulk-delete")):
+
+            return 204, None
+
+        if route == "/guilds/{id}":
+
+            return 200, self.guild(members=False)
+
+        if route == "/guilds/{id}/channels":
+
+            return 200, [self.channel(c) for c in self.channel_ids()]
+
+        if route == "/guilds/{id}/members/{id}":
+
+            member = self.members.get(path.rsplit("/", 1)[1])
+
+            return (200, member) if member else (404, {"message": "Unknown Member", "code": 10007})
+
+        if route == "/channels/{id}" and int(major) in self.channel_ids():
+
+            return 200, self.channel(int(major))
+
+        return 404, {"message": "404: Not Found (not simulated by loadtest.py)", "code": 0}
+
+    def received(self, channel_id, body):
+
+        # a reply arriving here ends the latency clock of the event(s) it answers
+
+        if not self.counting:
+
+            return
+
+        now = time.perf_counter()
+
+        if channel_id is not None and channel_id == self.log_channel:
+
+            self.log_posts += 1
+
+            self.log_embeds += body.count('"title"')
+
+            return
+
+        matched = False
+
+        for tag, user_id in MARKER.findall(body):
+
+            entry = self.pending.pop(f"lt{tag}" if tag else f"u{user_id}", None)
+
+            if entry is not None:
+
+                kind, sent_at = entry
+
+                self.latencies[kind].append(now - sent_at)
+
+                matched = True
+
+        queue = self.untagged.get(channel_id)
+
+        if not matched and queue:
+
+            kind, sent_at = queue.popleft()
+
+            self.latencies[kind].append(now - sent_at)
+
+    # ----------------- replay -----------------
+
+    async def setup(self):
+
+        # a staff member clicks "Set Welcome Channel" in #welcome, so joins produce welcome messages
+
+        self.setup_interaction = str(snowflake())
+
+        interaction = {"id": self.setup_interaction, "application_id": str(self.app_id), "type": 3, "token": "loadtest-setup", "version": 1,
+
+                       "guild_id": str(self.guild_id), "channel_id": str(self.welcome), "channel": self.channel(self.welcome),
+
+                       "member": dict(self.members[self.staff["id"]], permissions="8"), "data": {"custom_id": "welcome:set_channel", "component_type": 2},
+
+                       "message": self.message(self.welcome, self.bot), "locale": "en-US", "guild_locale": "en-US", "app_permissions": "8",
+
+                       "entitlements": [], "attachment_size_limit": 8388608, "context": 0, "authorizing_integration_owners": {}}
+
+        await self.dispatch("INTERACTION_CREATE", interaction)
+
+        await asyncio.wait_for(self.setup_done.wait(), 60)
+
+    async def send_event(self, n, event):
+
+        kind = event["kind"]
+
+        channel_id = self.chat[event.get("channel", 0) % len(self.chat)]
+
+        if kind == "join":
+
+            # every join is a new member; the welcome message mentions them
+
+            user = self.user(snowflake(), f"joiner-{n}")
+
+            member = self.members[user["id"]] = self.member(user, [])
+
+            sent = await self.dispatch("GUILD_MEMBER_ADD", dict(member, guild_id=str(self.guild_id)))
+
+            key = f"u{user['id']}"
+
+        else:
+
+            content = event.get("content", "")
+
+            key = None
+
+            if kind == "code":
+
+                key = f"lt{n:07d}"
+
+                content = f"{content} :{key}" if ":" in content else f"{content} : :{key}"
+
+            author = self.user(1000 + event.get("user", 0), f"user-{event.get('user', 0)}")
+
+            message = self.message(channel_id, author, content)
+
+            # MESSAGE_CREATE carries the author's member data without the user object
+
+            roles = [str(self.staff_role)] if event.get("staff") else []
+
+            message.update(guild_id=str(self.guild_id), member={"roles": roles, "joined_at": now_iso(), "deaf": False, "mute": False, "flags": 0})
+
+            sent = await self.dispatch("MESSAGE_CREATE", message)
+
+        if not sent:
+
+            self.dropped += 1
+
+            return
+
+        self.sent[kind] += 1
+
+        sent_at = time.perf_counter()
+
+        if key is not None:
+
+            self.pending[key] = (kind, sent_at)
+
+        elif kind == "command":
+
+            self.untagged[channel_id].append((kind, sent_at))
+
+    async def replay(self, trace, speed):
+
+        self.counting = True
+
+        started = time.perf_counter()
+
+        behind = 0.0
+
+        for n, event in enumerate(trace):
+
+            delay = started + event["at"] / speed - time.perf_counter()
+
+            if delay > 0:
+
+                await asyncio.sleep(delay)
+
+            else:
+
+                behind = max(behind, -delay)
+
+            await self.send_event(n, event)
+
+        return time.perf_counter() - started, behind
+
+    def report(self, elapsed, behind):
+
+        events = sum(self.sent.values())
+
+        print(f"\n📈 Replayed {events} events in {elapsed:.1f}s ({events / max(elapsed, 1e-9):.1f}/s, max scheduling lag {behind * 1000:.0f} ms, {self.dropped} dropped while disconnected)")
+
+        print(f"  {'kind':<10} {'sent':>7} {'answered':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+
+        for kind, _ in KINDS:
+
+            lat = self.latencies.get(kind, [])
+
+            row = f"  {kind:<10} {self.sent[kind]:>7} {len(lat):>9}"
+
+            if lat:
+
+                row += " " + " ".join(f"{percentile(lat, p) * 1000:>9.1f}" for p in (50, 95, 99, 100))
+
+            print(row)
+
+        total = sum(self.calls.values())
+
+        print(f"  REST calls: {total} ({total / max(events, 1):.2f} per event), 429s served: {sum(self.served_429.values())}, statuses: {dict(self.statuses)}")
+
+        for route, count in self.calls.most_common():
+
+            limited = self.served_429.get(route, 0)
+
+            print(f"    {count:>7}  {route}" + (f"  ({limited} × 429)" if limited else ""))
+
+        print(f"  Log channel: {self.log_posts} posts carrying {self.log_embeds} log embeds")
+
+        unanswered = Counter(kind for kind, _ in self.pending.values())
+
+        for queue in self.untagged.values():
+
+            unanswered.update(kind for kind, _ in queue)
+
+        if unanswered:
+
+            print(f"  Unanswered after drain: {dict(unanswered)}")
+
+async def run(args):
+
+    fake = FakeDiscord(args)
+
+    app = web.Application(client_max_size=0)
+
+    app.router.add_route("*", "/api/v10/{tail:.*}", fake.rest)
+
+    app.router.add_get("/gateway", fake.gateway)
+
+    runner = web.AppRunner(app, access_log=None)
+
+    await runner.setup()
+
+    await web.TCPSite(runner, args.host, args.port).start()
+
+    print(f"🧪 Fake Discord on {fake.base_url}; start the bot with config.json:")
+
+    print(f'   "api_base": "{fake.base_url}/api/v10", "gateway_url": "ws://{args.host}:{args.port}/gateway"')
+
+    try:
+
+        await fake.identified.wait()
+
+        print("🔌 Bot identified; setting the welcome channel")
+
+        try:
+
+            await fake.setup()
+
+        except asyncio.TimeoutError:
+
+            print("⚠️ The bot never answered the welcome menu click; joins will go unanswered")
+
+        # let on_ready and startup logging settle before measuring
+
+        await asyncio.sleep(args.warmup)
+
+        trace = load_trace(args.trace) if args.trace else synthetic_trace(args.rate, args.duration, args.channels)
+
+        if args.record:
+
+            with open(args.record, "w") as f:
+
+                f.writelines(json.dumps(e) + "\n" for e in trace)
+
+        print(f"▶️ Replaying {len(trace)} events at {args.speed}x")
+
+        elapsed, behind = await fake.replay(trace, args.speed)
+
+        await asyncio.sleep(args.drain)
+
+        fake.report(elapsed, behind)
+
+    finally:
+
+        await runner.cleanup()
+
+def read_log_channel():
+
+    try:
+
+        with open("channel_id.txt") as f:
+
+            return int(f.read().strip() or 0)
+
+    except (OSError, ValueError):
+
+        return 0
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Load-test the bot against a local Discord stand-in")
+
+    parser.add_argument("--host", default="127.0.0.1")
+
+    parser.add_argument("--port", type=int, default=8765)
+
+    parser.add_argument("--rate", type=float, default=20, help="synthetic events per second")
+
+    parser.add_argument("--duration", type=float, default=60, help="synthetic trace length in seconds")
+
+    parser.add_argument("--channels", type=int, default=4, help="chat channels events are spread over")
+
+    parser.add_argument("--trace", help="replay this JSONL trace instead of a synthetic one")
+
+    parser.add_argument("--record", help="write the trace being replayed to this JSONL file")
+
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed multiplier (10 = ten times the trace's rate)")
+
+    parser.add_argument("--limit", type=int, default=5, help="requests per route bucket per window")
+
+    parser.add_argument("--per", type=float, default=5.0, help="route bucket window in seconds")
+
+    parser.add_argument("--global-limit", type=int, default=50, help="requests per second across all routes")
+
+    parser.add_argument("--chaos", type=float, default=0.0, help="share of requests answered with a random 429")
+
+    parser.add_argument("--warmup", type=float, default=5.0)
+
+    parser.add_argument("--drain", type=float, default=15.0, help="seconds to wait for replies after the last event")
+
+    args = parser.parse_args()
+
+    args.log_channel = read_log_channel()
+
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+
+    main()
\ No newline at end of file
@@ -1,967 +1,4115 @@
 # full_merged_bot.py
 
+import time
+
+# startup timeline: imports are measured from here
+
+BOOT_IMPORTS_STARTED = time.time()
+
 import discord
 
 from discord.ext import commands, tasks
 
-from discord import ui, ButtonStyle
+from discord import ui, ButtonStyle, app_commands
 
-from flask import Flask
+import os, sys, threading, asyncio, json, aiohttp, sqlite3, itertools, math, re, bisect, functools, heapq, logging, queue, random, hashlib
 
-import os, sys, threading, asyncio, json, aiohttp
+import logging.handlers
+
+from collections import deque, Counter, OrderedDict
+
+from concurrent.futures import ThreadPoolExecutor
 
 from datetime import datetime
 
+from typing import Optional
+
 import pytz
 
-import time
+import yarl
 
-# ----------------- CONFIG / FILES -----------------
+# ----------------- STARTUP TIMELINE -----------------
 
-def read_file(path):
+def process_started_at():
 
-    try:
+    # an exec restart keeps the pid (and its /proc start time), so it hands over its own timestamp
 
-        with open(path, "r") as f:
+    exec_at = os.environ.pop("BOT_EXEC_AT", None)
 
-            return f.read().strip()
+    if exec_at:
 
-    except:
+        return float(exec_at)
 
-        return None
+    try:
 
-TOKEN = read_file("token.txt")
+        with open("/proc/self/stat") as f:
 
-LOG_CHANNEL_ID = int(read_file("channel_id.txt") or 0)
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
 
-REPLIT_URL = read_file("site.txt") or "http://localhost:8080"
+        with open("/proc/uptime") as f:
 
-OWNER_ID = 1156569457125244949
+            uptime = float(f.read().split()[0])
 
-CONFIG_FILE = "config.json"
+        return time.time() - (uptime - start_ticks / os.sysconf("SC_CLK_TCK"))
 
-WELCOME_FILE = "welcome_config.json"
+    except (OSError, ValueError, IndexError):
 
-# defaults
+        return BOOT_IMPORTS_STARTED
 
-DEFAULT_CONFIG = {
+class BootTimeline:
 
-    "restart_interval": 1800,
+    # (phase, seconds) from process start (or soft restart) up to on_ready
 
-    "allowed_roles": ["Staff", "Admin", "Moderator"],
+    def __init__(self, kind, started):
 
-    "shutdown_default_minutes": 5
+        self.kind = kind
 
-}
+        self.started = started
 
-DEFAULT_WELCOME = {
+        self.last = started
 
-    "welcome_enabled": True,
+        self.phases = []
 
-    "goodbye_enabled": True,
+        self.done = False
 
-    "welcome_channel_id": None,
+    def mark(self, name, at=None):
 
-    "welcome_message": "🎉 Welcome {user} to {guild}!",
+        # returns True the first time "ready" is marked; later reconnects don't add phases
 
-    "goodbye_message": "👋 Goodbye {user}, we’ll miss you in {guild}!"
+        if self.done or any(n == name for n, _ in self.phases):
 
-}
+            return False
 
-# Load/save helpers
+        at = at or time.time()
 
-def load_json(path, default):
+        self.phases.append((name, max(0.0, at - self.last)))
 
-    try:
+        self.last = at
 
-        with open(path, "r") as f:
+        self.done = name == "ready"
 
-            return json.load(f)
+        return self.done
 
-    except:
+    @property
 
-        with open(path, "w") as f:
+    def total(self):
 
-            json.dump(default, f, indent=4)
+        return self.last - self.started
 
-        return default.copy()
+    def summary(self):
 
-def save_json(path, data):
+        return " · ".join(f"{name} {secs:.2f}s" for name, secs in self.phases)
 
-    with open(path, "w") as f:
+boot = BootTimeline("exec restart" if "BOT_EXEC_AT" in os.environ else "cold start", process_started_at())
 
-        json.dump(data, f, indent=4)
+boot.mark("interpreter", BOOT_IMPORTS_STARTED)
 
-config = load_json(CONFIG_FILE, DEFAULT_CONFIG)
+boot.mark("imports")
 
-welcome_cfg = load_json(WELCOME_FILE, DEFAULT_WELCOME)
+# ----------------- CONFIG / FILES -----------------
 
-# convenience vars
+def read_file(path):
 
-restart_interval = config.get("restart_interval", 1800)
+    try:
 
-ALLOWED_ROLES = config.get("allowed_roles", DEFAULT_CONFIG["allowed_roles"])
+        with open(path, "r") as f:
 
-shutdown_default_minutes = config.get("shutdown_default_minutes", DEFAULT_CONFIG["shutdown_default_minutes"])
+            return f.read().strip()
 
-# ----------------- FLASK KEEP-ALIVE -----------------
+    except:
 
-app = Flask(__name__)
+        return None
 
-@app.route('/')
+TOKEN = read_file("token.txt")
 
-def home():
+LOG_CHANNEL_ID = int(read_file("channel_id.txt") or 0)
 
-    return "Bot is alive!"
+REPLIT_URL = read_file("site.txt") or "http://localhost:8080"
 
-def run_flask():
+OWNER_ID = 1156569457125244949
 
-    app.run(host='0.0.0.0', port=8080)
+CONFIG_FILE = "config.json"
 
-def keep_alive():
+WELCOME_FILE = "welcome_config.json"
 
-    t = threading.Thread(target=run_flask, daemon=True)
+RUNTIME_STATE_FILE = "runtime_state.json"
 
-    t.start()
+SETTINGS_DB = "settings.db"
 
-# ----------------- TIME UTIL -----------------
+LOG_FILE = "bot_events.jsonl"
 
-PH_TZ = pytz.timezone("Asia/Manila")
+# launcher.py starts cluster workers with their shard range in the environment
 
-def ph_time_now():
+CLUSTER_ID = int(os.getenv("BOT_CLUSTER_ID", "0"))
 
-    return datetime.now(PH_TZ).strftime("%Y-%m-%d %H:%M:%S")
+CLUSTER_SHARD_IDS = [int(x) for x in os.getenv("BOT_SHARD_IDS", "").split(",") if x]
 
-# ----------------- DISCORD SETUP -----------------
+CLUSTER_SHARD_COUNT = int(os.getenv("BOT_SHARD_COUNT", "0"))
 
-intents = discord.Intents.default()
+if CLUSTER_SHARD_IDS:
 
-intents.guilds = True
+    # workers share the working directory; each keeps its own restart snapshot and event log
 
-intents.members = True
+    # (python's logging can't rotate one file from several processes)
 
-intents.messages = True
+    RUNTIME_STATE_FILE = f"runtime_state.{CLUSTER_ID}.json"
 
-intents.message_content = True
+    LOG_FILE = f"bot_events.{CLUSTER_ID}.jsonl"
 
-bot = commands.Bot(command_prefix="!", intents=intents, help_command=None)
+# defaults
 
-last_self_ping = None
+DEFAULT_CONFIG = {
 
-last_restart_time = None
+    "restart_interval": 1800,
 
-restart_timer = None
+    "restart_interval_enabled": False,
 
-# ----------------- LOGGING -----------------
+    "allowed_roles": ["Staff", "Admin", "Moderator"],
 
-async def send_log(message: str, action: str = "INFO"):
+    "shutdown_default_minutes": 5,
 
-    if not LOG_CHANNEL_ID:
+    "log_queue_max": 500,
 
-        return
+    "log_flush_seconds": 2,
 
-    ch = bot.get_channel(LOG_CHANNEL_ID)
+    "ping_history": 120,
 
-    if not ch:
+    "save_delay_seconds": 1.0,
 
-        return
+    "settings_cache_size": 1024,
 
-    colors = {"INFO":0x2ecc71, "COMMAND":0x3498db, "ERROR":0xe74c3c, "RESTART":0xf1c40f, "ROLE":0x9b59b6}
+    "restart_mode": "soft",
 
-    emojis = {"INFO":"ℹ️","COMMAND":"📝","ERROR":"❌","RESTART":"♻️","ROLE":"🎭"}
+    "web_host": "0.0.0.0",
 
-    color = colors.get(action, 0x2ecc71)
+    "web_port": 8080,
 
-    emoji = emojis.get(action, "ℹ️")
+    "max_loop_lag": 2.0,
 
-    embed = discord.Embed(title=f"{emoji} {action} Log",
+    "low_memory_mode": False,
 
-                          description=message,
+    "join_burst_threshold": 5,
 
-                          color=color,
+    "join_burst_window": 10,
 
-                          timestamp=datetime.now(PH_TZ))
+    "join_burst_flush_seconds": 5,
 
-    embed.set_footer(text=f"Logged at {ph_time_now()} (PH Time)")
+    "delete_window_seconds": 1.0,
 
-    try:
+    "channel_send_rate": 5,
 
-        await ch.send(embed=embed)
+    "channel_send_per": 5.0,
 
-    except:
+    "alert_reserve": 1,
 
-        # fallback to plain message if embed send fails
+    "shard_mode": "single",
 
-        try:
+    "shard_count": None,
 
-            await ch.send(f"{emoji} {action} Log — {message}")
+    "cluster_workers": 2,
 
-        except:
+    "cluster_report_seconds": 30,
 
-            pass
+    "watchdog_rss_mb": 450,
 
-# ----------------- AUTO-RESTART -----------------
+    "watchdog_loop_lag": 1.0,
 
-def restart_process():
+    "watchdog_latency": 5.0,
 
-    # note: this re-executes the python process (works on most hosts)
+    "watchdog_sustain_seconds": 120,
 
-    os.execv(sys.executable, [sys.executable] + sys.argv)
+    "watchdog_sample_seconds": 15,
 
-def schedule_restart():
+    "watchdog_min_uptime": 300,
 
-    global restart_timer
+    "fast_boot": False,
 
-    if restart_timer:
+    "resume_sessions": True,
 
-        restart_timer.cancel()
+    "resume_max_age": 90,
 
-    restart_timer = threading.Timer(restart_interval, restart_process)
+    "resume_max_guilds": 50,
 
-    restart_timer.start()
+    "log_ring_size": 2000,
 
-schedule_restart()
+    "log_file_max_bytes": 5000000,
 
-# ----------------- SELF-PING -----------------
+    "log_file_backups": 3,
 
-@tasks.loop(minutes=1)
+    "probe_targets": [],
 
-async def self_ping_task():
+    "probe_interval": 60,
 
-    global last_self_ping
+    "probe_jitter": 0.2,
 
-    ts = ph_time_now()
+    "probe_max_backoff": 900,
 
-    try:
+    "probe_breaker_failures": 5,
 
-        async with aiohttp.ClientSession() as session:
+    "probe_breaker_cooldown": 600,
 
-            async with session.get(REPLIT_URL) as resp:
+    "probe_summary_minutes": 60,
 
-                await resp.text()
+    "message_content_intent": True,
 
-        last_self_ping = ts
+    "api_base": None,
 
-        await send_log(f"✅ Self-ping successful at {ts}", action="INFO")
+    "gateway_url": None
 
-    except Exception as e:
+}
 
-        await send_log(f"❌ Self-ping failed at {ts}: {e}", action="ERROR")
+DEFAULT_WELCOME = {
 
-# ----------------- PERMISSION HELPERS -----------------
+    "welcome_enabled": True,
 
-def is_staff_check():
+    "goodbye_enabled": True,
 
-    async def predicate(ctx):
+    "welcome_channel_id": None,
 
-        if ctx.author.id == OWNER_ID:
+    "welcome_message": "🎉 Welcome {user} to {guild}!",
 
-            return True
+    "goodbye_message": "👋 Goodbye {user}, we’ll miss you in {guild}!"
 
-        # guild permission
+}
 
-        if ctx.author.guild_permissions.manage_guild:
+# Load/save helpers
 
-            return True
+def write_json_atomic(path, payload):
 
-        for role in ctx.author.roles:
+    # temp file + rename so a crash mid-write never leaves half a json file behind
 
-            if role.name in ALLOWED_ROLES:
+    tmp = f"{path}.tmp"
 
-                return True
+    with open(tmp, "w") as f:
 
-        return False
+        f.write(payload)
 
-    return commands.check(predicate)
+        f.flush()
 
-# ----------------- AUTO-DELETE (after invoke) -----------------
+        os.fsync(f.fileno())
 
-@bot.after_invoke
+    os.replace(tmp, path)
 
-async def _delete_command_message(ctx):
+def load_json(path, default):
 
     try:
 
-        if ctx.message:
+        with open(path, "r") as f:
 
-            await ctx.message.delete()
+            return json.load(f)
 
-    except:
+    except FileNotFoundError:
 
         pass
 
-# also delete any message starting with "!" (non-command fallback)
+    except ValueError:
 
-@bot.event
+        # keep the broken file around instead of silently resetting it
 
-async def on_message(message):
+        os.replace(path, f"{path}.corrupt")
 
-    if message.author.bot:
+        print(f"⚠️ {path} was corrupt, moved to {path}.corrupt and reset to defaults")
 
-        return
+    except OSError as e:
 
-    # immediate delete for raw '!' messages (skip if it's a bot DM)
+        print(f"⚠️ Could not read {path}: {e}")
 
-    if message.content.startswith("!"):
+        return default.copy()
 
-        try:
+    write_json_atomic(path, json.dumps(default, indent=4))
 
-            await message.delete()
+    return default.copy()
 
-        except:
+class WriteBehindStore:
 
-            pass
+    # debounces bursts of mutations into a single write per key, done off the event loop
 
-    # CODE listener (we also keep code detection here)
+    def __init__(self, delay):
 
-    content_up = message.content.upper()
+        self.delay = delay
 
-    if content_up.startswith("CODE "):
+        self.dirty = {}
 
-        # handle CODE system
+        self.handle = None
 
-        parts = message.content.split(":", 1)
+        # one worker thread keeps writes to the same file in order
 
-        code_part = parts[0].strip().replace("CODE ", "").upper()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="store")
 
-        note = parts[1].strip() if len(parts) > 1 else None
+    def mark_dirty(self, key, data, writer):
 
-        if code_part in CODE_MEANINGS:
+        self.dirty[key] = (data, writer)
 
-            # check permission: manage_messages or allowed role
+        try:
 
-            has_perm = message.author.guild_permissions.manage_messages
+            loop = asyncio.get_running_loop()
 
-            for r in message.author.roles:
+        except RuntimeError:
 
-                if r.name in ALLOWED_ROLES:
+            # no event loop (startup / timer thread): write straight away
 
-                    has_perm = True
+            self.flush_sync()
 
-                    break
+            return
 
-            if not has_perm:
+        if self.handle is None:
 
-                try:
+            self.handle = loop.call_later(self.delay, lambda: loop.create_task(self.flush()))
 
-                    await message.channel.send("❌ You do not have permission to use CODE commands.", delete_after=10)
+    def take(self):
 
-                except:
+        if self.handle is not None:
 
-                    pass
+            self.handle.cancel()
 
-            else:
+            self.handle = None
 
-                meaning, color, emoji = CODE_MEANINGS[code_part]
+        pending, self.dirty = self.dirty, {}
 
-                embed = discord.Embed(title=f"{emoji} CODE {code_part}", description=meaning, color=color)
+        # serialize on the calling thread so the writer never sees a dict mid-mutation
 
-                if note:
+        return [(key, data, writer, json.dumps(data, indent=4)) for key, (data, writer) in pending.items()]
 
-                    words = note.split()
+    def requeue(self, key, data, writer, error):
 
-                    formatted = [f"**{w[1:]}**" if w.startswith(":") else w for w in words]
+        print(f"⚠️ Write-behind save of {key} failed: {error}")
 
-                    embed.add_field(name="📝 Note", value=" ".join(formatted), inline=False)
+        self.dirty.setdefault(key, (data, writer))
 
-                try:
+    async def flush(self):
 
-                    await message.delete()
+        loop = asyncio.get_running_loop()
 
-                except:
+        for key, data, writer, payload in self.take():
 
-                    pass
+            try:
 
-                if message.reference and message.reference.resolved:
+                await loop.run_in_executor(self.executor, writer, key, payload)
 
-                    try:
+            except Exception as e:
 
-                        await message.reference.resolved.reply(embed=embed)
+                self.requeue(key, data, writer, e)
 
-                    except:
+    def flush_sync(self):
 
-                        await message.channel.send(embed=embed)
+        # blocking flush for shutdown/restart; still goes through the worker so it lands after queued writes
 
-                else:
+        for key, data, writer, payload in self.take():
 
-                    await message.channel.send(embed=embed)
+            try:
 
-    # allow commands to be processed
+                self.executor.submit(writer, key, payload).result()
 
-    await bot.process_commands(message)
+            except Exception as e:
 
-# ----------------- CODE SYSTEM DATA -----------------
+                self.requeue(key, data, writer, e)
 
-CODE_MEANINGS = {
+config = load_json(CONFIG_FILE, DEFAULT_CONFIG)
 
-    "BLUE": ("MAY VERIFICATION", 0x3498db, "🔹"),
+# convenience vars
 
-    "RED": ("PALDO", 0xe74c3c, "🔴"),
+# defer the web server, aiohttp.web and member chunking until after on_ready
 
-    "GREEN": ("NA LOOT NA", 0x2ecc71, "🟢"),
+fast_boot = config.get("fast_boot", DEFAULT_CONFIG["fast_boot"])
 
-    "YELLOW": ("MAY PAG ASA PA", 0xf1c40f, "🟡"),
+restart_interval = config.get("restart_interval", 1800)
 
-    "ORANGE": ("NABUKSAN", 0xe67e22, "🟠"),
+shutdown_default_minutes = config.get("shutdown_default_minutes", DEFAULT_CONFIG["shutdown_default_minutes"])
 
-    "PURPLE": ("SECURE", 0x9b59b6, "🟣"),
+# "soft": rebuild the client inside this process, "exec": re-execute the interpreter
 
-    "BLACK": ("BAN", 0x000000, "⚫")
+restart_mode = config.get("restart_mode", DEFAULT_CONFIG["restart_mode"])
 
-}
+# no startup chunking, no member/message cache; member objects come with the events that need them
 
-# ----------------- BASIC PUBLIC COMMANDS -----------------
+low_memory_mode = config.get("low_memory_mode", DEFAULT_CONFIG["low_memory_mode"])
 
-@bot.command(name="status")
+log_queue_max = config.get("log_queue_max", DEFAULT_CONFIG["log_queue_max"])
 
-async def status_cmd(ctx):
+log_flush_seconds = config.get("log_flush_seconds", DEFAULT_CONFIG["log_flush_seconds"])
 
-    e = discord.Embed(title="📊 Bot Status", color=0x00ffcc)
+ping_history = config.get("ping_history", DEFAULT_CONFIG["ping_history"])
 
-    e.add_field(name="Bot Online", value="✅ Yes", inline=False)
+# "single": one gateway connection, "auto": AutoShardedBot in this process, "cluster": launcher.py workers
 
-    e.add_field(name="Servers", value=str(len(bot.guilds)), inline=True)
+shard_mode = "cluster" if CLUSTER_SHARD_IDS else config.get("shard_mode", DEFAULT_CONFIG["shard_mode"])
 
-    e.add_field(name="Last Self-Ping", value=(last_self_ping or "Never"), inline=True)
+if shard_mode == "cluster" and not CLUSTER_SHARD_IDS:
 
-    await ctx.send(embed=e, delete_after=20)
+    print("⚠️ shard_mode 'cluster' is started through launcher.py; running all shards in this process")
 
-@bot.command(name="publicstatus")
+    shard_mode = "auto"
 
-async def publicstatus_cmd(ctx):
+# off: no MESSAGE_CREATE events at all; commands and CODE alerts are slash commands only
 
-    mins = restart_interval // 60
+message_content_intent = config.get("message_content_intent", DEFAULT_CONFIG["message_content_intent"])
 
-    lr = last_restart_time or "No restart recorded yet"
+json_store = WriteBehindStore(config.get("save_delay_seconds", DEFAULT_CONFIG["save_delay_seconds"]))
 
-    e = discord.Embed(title="📊 Public Status", color=0x3498db)
+# ----------------- PER-GUILD SETTINGS -----------------
 
-    e.add_field(name="Auto-Restart Interval", value=f"{mins} minutes", inline=False)
+# every guild starts from these; config.json "allowed_roles" is the template for new guilds
 
-    e.add_field(name="Last Restart", value=lr, inline=False)
+DEFAULT_GUILD = {"allowed_roles": config.get("allowed_roles", DEFAULT_CONFIG["allowed_roles"]), **DEFAULT_WELCOME}
 
-    await ctx.send(embed=e)
+class GuildSettingsStore:
 
-    await send_log(f"[{ph_time_now()}] {ctx.author} ran !publicstatus", action="COMMAND")
+    # guild settings in sqlite keyed by guild id, fronted by a bounded LRU so hot guilds never touch disk
 
-@bot.command(name="config")
+    def __init__(self, path, cache_size):
 
-async def config_cmd(ctx):
+        self.cache_size = cache_size
 
-    mins = restart_interval // 60
+        self.cache = OrderedDict()
 
-    roles = ", ".join(ALLOWED_ROLES) if ALLOWED_ROLES else "None"
+        self.lock = threading.Lock()
 
-    e = discord.Embed(title="⚙️ Bot Configuration", color=0x00ffcc)
+        self.legacy_cutoff = None
 
-    e.add_field(name="Restart Interval", value=f"{mins} minutes", inline=False)
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
 
-    e.add_field(name="Allowed Roles", value=roles, inline=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
 
-    await ctx.send(embed=e)
+        self.db.execute("CREATE TABLE IF NOT EXISTS guild_settings (guild_id INTEGER PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)")
 
-    await send_log(f"[{ph_time_now()}] {ctx.author} ran !config", action="COMMAND")
+        self.db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
 
-# custom help
+        self.db.execute("CREATE TABLE IF NOT EXISTS cluster_workers (worker_id INTEGER PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)")
 
-@bot.command(name="help")
+    def query(self, sql, args=()):
 
-async def help_cmd(ctx):
+        with self.lock:
 
-    e = discord.Embed(title="📖 Help", color=0x00ffcc)
+            return self.db.execute(sql, args).fetchall()
 
-    e.add_field(name="Public", value="`!status`, `!publicstatus`, `!config`, `!help`, `!notifier`, `!welcomemenu`", inline=False)
+    def get(self, guild_id):
 
-    e.set_footer(text="Staff commands: use !staffhelp")
+        settings = self.cache.get(guild_id)
 
-    await ctx.send(embed=e)
+        if settings is not None:
 
-@bot.command(name="notifier")
+            self.cache.move_to_end(guild_id)
 
-async def notifier_cmd(ctx):
+            return settings
 
-    e = discord.Embed(title="📖 CODE Help", description="Available CODE alerts:", color=0x00ffcc)
+        pending = json_store.dirty.get(("guild", guild_id))
 
-    for code, (meaning, _, emoji) in CODE_MEANINGS.items():
+        if pending is not None:
 
-        e.add_field(name=f"{emoji} CODE {code}", value=meaning, inline=False)
+            # evicted before its write landed: the pending copy is newer than the row
 
-    e.set_footer(text="Usage: CODE <COLOR> : optional note")
+            settings = pending[0]
 
-    await ctx.send(embed=e, delete_after=20)
+        else:
 
-# ----------------- STAFF COMMANDS (full) -----------------
+            rows = self.query("SELECT data FROM guild_settings WHERE guild_id = ?", (guild_id,))
 
-@bot.command(name="staffhelp", hidden=True)
+            settings = {k: (list(v) if isinstance(v, list) else v) for k, v in DEFAULT_GUILD.items()}
 
-@is_staff_check()
+            if rows:
 
-async def staffhelp_cmd(ctx):
+                settings.update(json.loads(rows[0][0]))
 
-    e = discord.Embed(title="🛠️ Staff Help", color=0xffcc00)
+        self.cache[guild_id] = settings
 
-    staff_cmds = {
+        if len(self.cache) > self.cache_size:
 
-        "restart": "Manual restart (30s cooldown)",
+            self.cache.popitem(last=False)
 
-        "lastrestart": "Show last restart",
+        return settings
 
-        "setrestarttime <min>": "Set auto-restart interval (5-720)",
+    def save(self, guild_id, settings):
 
-        "showrestarttime": "Show current interval",
+        # write-behind like the json files: bursts collapse into one row write off the loop
 
-        "addrole <role>": "Add allowed staff role (name or mention)",
+        self.cache[guild_id] = settings
 
-        "removerole <role>": "Remove allowed staff role (name or mention)",
+        embed_cache.invalidate_guild(guild_id)
 
-        "listroles": "List allowed staff roles",
+        json_store.mark_dirty(("guild", guild_id), settings, self.write_row)
 
-        "cheatsheet": "Quick reference",
+    def write_row(self, key, payload):
 
-        "welcomemenu": "Interactive welcome & goodbye menu",
+        with self.lock:
 
-        "shutdown <minutes?>": "Owner-only timed shutdown"
+            self.db.execute("INSERT INTO guild_settings (guild_id, data, updated_at) VALUES (?, ?, ?) ON CONFLICT(guild_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at", (key[1], payload, time.time()))
 
-    }
+    def get_meta(self, key):
 
-    e.add_field(name="Staff Commands", value="\n".join([f"!{k} → {v}" for k,v in staff_cmds.items()]), inline=False)
+        rows = self.query("SELECT value FROM meta WHERE key = ?", (key,))
 
-    await ctx.send(embed=e, delete_after=25)
+        return json.loads(rows[0][0]) if rows else None
 
-    await send_log(f"[{ph_time_now()}] {ctx.author} ran !staffhelp", action="COMMAND")
+    def set_meta(self, key, value):
 
-@bot.command(name="cheatsheet", hidden=True)
+        json_store.mark_dirty(("meta", key), value, self.write_meta)
 
-@is_staff_check()
+    def write_meta(self, key, payload):
 
-async def cheatsheet_cmd(ctx):
+        with self.lock:
 
-    e = discord.Embed(title="📖 Cheatsheet", color=0x7289da)
+            self.db.execute("INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value", (key[1], payload))
 
-    e.add_field(name="Commands", value="See !staffhelp for list", inline=False)
+    def report_worker(self, worker_id, stats):
 
-    await ctx.send(embed=e, delete_after=20)
+        json_store.mark_dirty(("worker", worker_id), stats, self.write_worker)
 
-    await send_log(f"[{ph_time_now()}] {ctx.author} ran !cheatsheet", action="COMMAND")
+    def write_worker(self, key, payload):
 
-# restart
+        with self.lock:
 
-@bot.command(name="restart", hidden=True)
+            self.db.execute("INSERT INTO cluster_workers (worker_id, data, updated_at) VALUES (?, ?, ?) ON CONFLICT(worker_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at", (key[1], payload, time.time()))
 
-@is_staff_check()
+    def cluster_workers(self, max_age):
 
-@commands.cooldown(1, 30, commands.BucketType.user)
+        rows = self.query("SELECT data FROM cluster_workers WHERE updated_at >= ?", (time.time() - max_age,))
 
-async def restart_cmd(ctx):
+        return [json.loads(r[0]) for r in rows]
 
-    global last_restart_time
+    def config_overrides(self):
 
-    last_restart_time = ph_time_now()
+        rows = self.query("SELECT key, value FROM meta WHERE key LIKE 'config:%'")
 
-    await ctx.send("♻️ Restarting bot...", delete_after=10)
+        return {key[len("config:"):]: json.loads(value) for key, value in rows}
 
-    await send_log(f"♻️ Bot restart requested by {ctx.author}", action="RESTART")
+    def migrate_legacy(self, guilds):
 
-    await bot.close()
+        # one-time import of the old global config.json roles / welcome_config.json, decided per guild:
 
-    # ensure process restarts
+        # a guild with a settings row is done, so each cluster worker migrates the guilds it owns
 
-    restart_process()
+        if not os.path.exists(WELCOME_FILE):
 
-@bot.command(name="lastrestart", hidden=True)
+            return 0
 
-@is_staff_check()
+        if self.legacy_cutoff is None:
 
-@commands.cooldown(1, 30, commands.BucketType.user)
+            # the first worker to get here fixes the upgrade time; guilds joined after it start from the defaults
 
-async def lastrestart_cmd(ctx):
+            with self.lock:
 
-    if last_restart_time:
+                self.db.execute("INSERT INTO meta (key, value) VALUES ('legacy_json_cutoff', ?) ON CONFLICT(key) DO NOTHING", (json.dumps(time.time()),))
 
-        await ctx.send(f"♻️ Last restart: **{last_restart_time}**", delete_after=15)
+            self.legacy_cutoff = self.get_meta("legacy_json_cutoff")
 
-    else:
+        todo = []
 
-        await ctx.send("❌ No restart recorded yet.", delete_after=10)
+        for g in guilds:
 
-    await send_log(f"[{ph_time_now()}] {ctx.author} ran !lastrestart", action="COMMAND")
+            # unavailable guilds have no channels yet; they are migrated from on_guild_available
 
-@bot.command(name="setrestarttime", hidden=True)
+            if g.unavailable or g.me is None or g.me.joined_at is None or g.me.joined_at.timestamp() >= self.legacy_cutoff:
 
-@is_staff_check()
+                continue
 
-async def setrestarttime_cmd(ctx, minutes: int):
+            if ("guild", g.id) in json_store.dirty or self.query("SELECT 1 FROM guild_settings WHERE guild_id = ?", (g.id,)):
 
-    global restart_interval
+                continue
 
-    if minutes < 5 or minutes > 720:
+            todo.append(g)
 
-        await ctx.send("❌ Value must be between 5 and 720 minutes.", delete_after=10)
+        if not todo:
 
-        return
+            return 0
 
-    restart_interval = minutes * 60
+        legacy_welcome = load_json(WELCOME_FILE, {})
 
-    config["restart_interval"] = restart_interval
+        count = 0
 
-    save_json(CONFIG_FILE, config)
+        for guild in todo:
 
-    schedule_restart()
+            settings = self.get(guild.id)
 
-    await ctx.send(f"✅ Auto-restart interval set to {minutes} minutes.", delete_after=10)
+            settings["allowed_roles"] = list(DEFAULT_GUILD["allowed_roles"])
 
-    await send_log(f"⚙️ Restart interval changed to {minutes}m by {ctx.author}", action="ROLE")
+            for k in DEFAULT_WELCOME:
 
-@bot.command(name="showrestarttime", hidden=True)
+                if k in legacy_welcome:
 
-@is_staff_check()
+                    settings[k] = legacy_welcome[k]
 
-async def showrestarttime_cmd(ctx):
+            # the old global channel id only belongs to one of the guilds
 
-    await ctx.send(f"⏱️ Current auto-restart interval: **{restart_interval//60} minutes**", delete_after=10)
+            if settings["welcome_channel_id"] and guild.get_channel(settings["welcome_channel_id"]) is None:
 
-    await send_log(f"[{ph_time_now()}] {ctx.author} ran !showrestarttime", action="COMMAND")
+                settings["welcome_channel_id"] = None
 
-# addrole / removerole accept mention or name
+            self.save(guild.id, settings)
 
-@bot.command(name="addrole", hidden=True)
+            count += 1
 
-@is_staff_check()
+        return count
 
-async def addrole_cmd(ctx, *, role_input: str):
+guild_settings = GuildSettingsStore(SETTINGS_DB, config.get("settings_cache_size", DEFAULT_CONFIG["settings_cache_size"]))
 
-    # try mention -> get role by id, else by name (case-insensitive)
+# settings changed by commands live in settings.db (meta "config:<key>"), shared by every cluster worker;
 
-    guild = ctx.guild
+# config.json is the hand-edited base and a running bot never rewrites it
 
-    role = None
+def apply_config(changes):
 
-    # role mention or id
+    global restart_interval, shutdown_default_minutes
 
-    if ctx.message.role_mentions:
+    config.update(changes)
 
-        role = ctx.message.role_mentions[0]
+    restart_interval = config.get("restart_interval", 1800)
 
-    else:
+    shutdown_default_minutes = config.get("shutdown_default_minutes", DEFAULT_CONFIG["shutdown_default_minutes"])
 
-        # try to parse as id
+apply_config(guild_settings.config_overrides())
 
-        if role_input.isdigit():
+def set_config(**changes):
 
-            role = guild.get_role(int(role_input))
+    for key, value in changes.items():
 
-        else:
+        guild_settings.set_meta(f"config:{key}", value)
 
-            # find by name case-insensitive
+    apply_config(changes)
 
-            for r in guild.roles:
+    embed_cache.invalidate_config()
 
-                if r.name.lower() == role_input.lower():
+def refresh_config():
 
-                    role = r
+    # picks up changes made on other workers
 
-                    break
+    changes = {k: v for k, v in guild_settings.config_overrides().items() if config.get(k) != v}
 
-    if not role:
+    if changes:
 
-        await ctx.send("❌ Role not found. Use role mention, id, or exact name.", delete_after=10)
+        apply_config(changes)
 
-        return
+        embed_cache.invalidate_config()
 
-    if role.name in ALLOWED_ROLES:
+def guild_cfg(guild):
 
-        await ctx.send(f"❌ Role `{role.name}` already allowed.", delete_after=10)
+    # settings for a guild; DMs get a throwaway copy of the defaults
 
-        return
+    if guild is None:
 
-    ALLOWED_ROLES.append(role.name)
+        return {k: (list(v) if isinstance(v, list) else v) for k, v in DEFAULT_GUILD.items()}
 
-    config["allowed_roles"] = ALLOWED_ROLES
+    return guild_settings.get(guild.id)
 
-    save_json(CONFIG_FILE, config)
+boot.mark("config & settings")
 
-    await ctx.send(f"✅ Role `{role.name}` added to allowed roles.", delete_after=10)
+# ----------------- TIME UTIL -----------------
 
-    await send_log(f"⚙️ {ctx.author} added role `{role.name}` to allowed roles.", action="ROLE")
+PH_TZ = pytz.timezone("Asia/Manila")
 
-@bot.command(name="removerole", hidden=True)
+def ph_time_now():
 
-@is_staff_check()
+    return datetime.now(PH_TZ).strftime("%Y-%m-%d %H:%M:%S")
 
-async def removerole_cmd(ctx, *, role_input: str):
+# ----------------- METRICS -----------------
 
-    guild = ctx.guild
+# prometheus text-format registry: counters/histograms keyed by label values, gauges read at scrape time
 
-    role = None
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
 
-    if ctx.message.role_mentions:
+def escape_label(value):
 
-        role = ctx.message.role_mentions[0]
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
 
-    else:
+class Metric:
 
-        if role_input.isdigit():
+    def __init__(self, name, help_text, kind, labels=()):
 
-            role = guild.get_role(int(role_input))
+        self.name = name
 
-        else:
+        self.help_text = help_text
 
-            for r in guild.roles:
+        self.kind = kind
 
-                if r.name.lower() == role_input.lower():
+        self.labels = labels
 
-                    role = r
+        self.values = {}
 
-                    break
+    def label_str(self, values, extra=()):
 
-    if not role or role.name not in ALLOWED_ROLES:
+        pairs = list(zip(self.labels, values)) + list(extra)
 
-        await ctx.send("❌ Role not in allowed list.", delete_after=10)
+        if not pairs:
 
-        return
+            return ""
 
-    ALLOWED_ROLES.remove(role.name)
+        return "{" + ",".join(f'{k}="{escape_label(v)}"' for k, v in pairs) + "}"
 
-    config["allowed_roles"] = ALLOWED_ROLES
+class CounterMetric(Metric):
 
-    save_json(CONFIG_FILE, config)
+    def __init__(self, name, help_text, labels=()):
 
-    await ctx.send(f"✅ Role `{role.name}` removed from allowed roles.", delete_after=10)
+        super().__init__(name, help_text, "counter", labels)
 
-    await send_log(f"⚙️ {ctx.author} removed role `{role.name}` from allowed roles.", action="ROLE")
+    def inc(self, *labels, amount=1):
 
-@bot.command(name="listroles", hidden=True)
+        self.values[labels] = self.values.get(labels, 0) + amount
 
-@is_staff_check()
+    def samples(self):
 
-async def listroles_cmd(ctx):
+        for labels, value in self.values.items():
 
-    await ctx.send(f"📋 Allowed roles: **{', '.join(ALLOWED_ROLES) if ALLOWED_ROLES else 'None'}**", delete_after=15)
+            yield f"{self.name}{self.label_str(labels)} {value}"
 
-    await send_log(f"[{ph_time_now()}] {ctx.author} ran !listroles", action="COMMAND")
+class HistogramMetric(Metric):
 
-# ----------------- SHUTDOWN (owner only, timed restart) -----------------
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
 
-@bot.command(name="shutdown", hidden=True)
+        super().__init__(name, help_text, "histogram", labels)
 
-async def shutdown_cmd(ctx, minutes: int = None):
+        self.buckets = buckets
 
-    # owner-only
+    def observe(self, value, *labels):
 
-    if ctx.author.id != OWNER_ID:
+        entry = self.values.get(labels)
 
-        return await ctx.send("❌ Only the bot owner can use this command.", delete_after=10)
+        if entry is None:
 
-    minutes = minutes if (minutes is not None) else config.get("shutdown_default_minutes", shutdown_default_minutes)
+            entry = self.values[labels] = [[0] * len(self.buckets), 0.0, 0]
 
-    if minutes < 0:
+        idx = bisect.bisect_left(self.buckets, value)
 
-        minutes = 0
+        if idx < len(self.buckets):
 
-    await ctx.send(f"🛑 Shutting down. Bot will attempt to restart in {minutes} minute(s).", delete_after=10)
+            entry[0][idx] += 1
 
-    await send_log(f"🛑 Shutdown initiated by {ctx.author} — restart in {minutes}m", action="RESTART")
+        entry[1] += value
 
-    # schedule restart (re-exec) after minutes; then close bot
+        entry[2] += 1
 
-    def delayed_restart(t):
+    def samples(self):
 
-        time.sleep(t*60)
+        for labels, (counts, total, count) in self.values.items():
 
-        try:
+            running = 0
 
-            restart_process()
+            for bound, n in zip(self.buckets, counts):
 
-        except Exception:
+                running += n
 
-            os.execv(sys.executable, [sys.executable] + sys.argv)
+                yield f"{self.name}_bucket{self.label_str(labels, [('le', bound)])} {running}"
 
-    threading.Thread(target=delayed_restart, args=(minutes,), daemon=True).start()
+            yield f"{self.name}_bucket{self.label_str(labels, [('le', '+Inf')])} {count}"
 
-    await bot.close()
+            yield f"{self.name}_sum{self.label_str(labels)} {total}"
 
-@bot.command(name="setshutdowntime", hidden=True)
+            yield f"{self.name}_count{self.label_str(labels)} {count}"
 
-@is_staff_check()
+class GaugeMetric(Metric):
 
-async def setshutdowntime_cmd(ctx, minutes: int):
+    def __init__(self, name, help_text, read):
 
-    config["shutdown_default_minutes"] = max(0, minutes)
+        super().__init__(name, help_text, "gauge")
 
-    save_json(CONFIG_FILE, config)
+        self.read = read
 
-    await ctx.send(f"✅ Default shutdown time set to {minutes} minute(s).", delete_after=10)
+    def samples(self):
 
-    await send_log(f"⚙️ {ctx.author} set default shutdown time to {minutes}m", action="ROLE")
-    
-    
+        value = self.read()
 
-# ----------------- WELCOME / GOODBYE (interactive buttons + fallback commands) -----------------
+        if value is not None and math.isfinite(value):
 
-class WelcomeView(ui.View):
+            yield f"{self.name} {value}"
 
-    def __init__(self, author):
+class MetricsRegistry:
 
-        super().__init__(timeout=300)
+    def __init__(self):
 
-        self.author = author
+        self.metrics = []
 
-    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+    def register(self, metric):
 
-        if interaction.user.id != self.author.id:
+        self.metrics.append(metric)
 
-            await interaction.response.send_message("❌ Only the command author can use this menu.", ephemeral=True)
+        return metric
 
-            return False
+    def counter(self, name, help_text, labels=()):
 
-        return True
+        return self.register(CounterMetric(name, help_text, labels))
 
-    @ui.button(label="Set Welcome Message", style=ButtonStyle.primary)
+    def histogram(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
 
-    async def btn_set_welcome(self, interaction: discord.Interaction, button: ui.Button):
+        return self.register(HistogramMetric(name, help_text, labels, buckets))
 
-        await interaction.response.send_message("✍️ Type the new welcome message in chat (use {user} and {guild}):", ephemeral=True)
+    def gauge(self, name, help_text, read):
 
-        try:
+        return self.register(GaugeMetric(name, help_text, read))
 
-            msg = await bot.wait_for("message", check=lambda m: m.author.id == interaction.user.id and m.channel == interaction.channel, timeout=60)
+    def render(self):
 
-            welcome_cfg["welcome_message"] = msg.content
+        lines = []
 
-            save_json(WELCOME_FILE, welcome_cfg)
+        for m in self.metrics:
 
-            try: await msg.delete()
+            lines.append(f"# HELP {m.name} {m.help_text}")
 
-            except: pass
+            lines.append(f"# TYPE {m.name} {m.kind}")
 
-            await interaction.followup.send("✅ Welcome message updated.", ephemeral=True)
+            try:
 
-            await send_log(f"⚙️ {interaction.user} set welcome message", action="COMMAND")
+                lines.extend(m.samples())
 
-        except asyncio.TimeoutError:
+            except Exception:
 
-            await interaction.followup.send("⏳ Timeout. Please try again.", ephemeral=True)
+                # a gauge whose source isn't available yet (e.g. before login) just has no sample
 
-    @ui.button(label="Set Goodbye Message", style=ButtonStyle.danger)
+                pass
 
-    async def btn_set_goodbye(self, interaction: discord.Interaction, button: ui.Button):
+        return "\n".join(lines) + "\n"
 
-        await interaction.response.send_message("✍️ Type the new goodbye message in chat (use {user} and {guild}):", ephemeral=True)
+metrics = MetricsRegistry()
 
-        try:
+commands_total = metrics.counter("bot_commands_total", "Commands invoked, by command name", ("command",))
 
-            msg = await bot.wait_for("message", check=lambda m: m.author.id == interaction.user.id and m.channel == interaction.channel, timeout=60)
+code_alerts_total = metrics.counter("bot_code_alerts_total", "CODE alerts sent, by colour", ("color",))
 
-            welcome_cfg["goodbye_message"] = msg.content
+command_duration = metrics.histogram("bot_command_duration_seconds", "Command handler duration", ("command", "status"))
 
-            save_json(WELCOME_FILE, welcome_cfg)
+event_duration = metrics.histogram("bot_event_duration_seconds", "Gateway event handler duration", ("event",))
 
-            try: await msg.delete()
+rest_duration = metrics.histogram("bot_rest_request_duration_seconds", "Outbound Discord REST call duration", ("method", "route", "status"))
 
-            except: pass
+log_delivery = metrics.histogram("bot_log_delivery_seconds", "Time from send_log() to the log message being posted")
 
-            await interaction.followup.send("✅ Goodbye message updated.", ephemeral=True)
+self_ping_duration = metrics.histogram("bot_self_ping_seconds", "Self-ping round trip")
 
-            await send_log(f"⚙️ {interaction.user} set goodbye message", action="COMMAND")
+probe_duration = metrics.histogram("bot_probe_seconds", "Health probe round trip, by target", ("target",))
 
-        except asyncio.TimeoutError:
+def timed_event(func):
 
-            await interaction.followup.send("⏳ Timeout. Please try again.", ephemeral=True)
+    # records handler duration under the event's name; functools.wraps keeps the name bot.event() registers by
 
-    @ui.button(label="Set Welcome Channel (current)", style=ButtonStyle.secondary)
+    @functools.wraps(func)
 
-    async def btn_set_channel(self, interaction: discord.Interaction, button: ui.Button):
+    async def wrapper(*args, **kwargs):
+
+        started = time.perf_counter()
+
+        try:
+
+            return await func(*args, **kwargs)
+
+        finally:
+
+            event_duration.observe(time.perf_counter() - started, func.__name__)
+
+    return wrapper
+
+ROUTE_IDS = re.compile(r"/\d{5,}")
+
+ROUTE_TOKENS = re.compile(r"/(webhooks|interactions)/\{id\}/[^/]+")
+
+def rest_route(url):
+
+    # collapse snowflakes / interaction tokens so the route label has bounded cardinality
+
+    path = url.path
+
+    if path.startswith("/api/v"):
+
+        path = "/" + path.split("/", 3)[-1]
+
+    path = ROUTE_IDS.sub("/{id}", path)
+
+    return ROUTE_TOKENS.sub(r"/\1/{id}/{token}", path)
+
+async def trace_request_start(session, trace_ctx, params):
+
+    trace_ctx.started = time.perf_counter()
+
+async def trace_request_end(session, trace_ctx, params):
+
+    rest_duration.observe(time.perf_counter() - trace_ctx.started, params.method, rest_route(params.url), str(params.response.status))
+
+async def trace_request_exception(session, trace_ctx, params):
+
+    rest_duration.observe(time.perf_counter() - trace_ctx.started, params.method, rest_route(params.url), "error")
+
+rest_trace = aiohttp.TraceConfig()
+
+rest_trace.on_request_start.append(trace_request_start)
+
+rest_trace.on_request_end.append(trace_request_end)
+
+rest_trace.on_request_exception.append(trace_request_exception)
+
+# ----------------- OUTBOUND SCHEDULER -----------------
+
+# lower number goes first; only alerts may spend the slot reserved in each channel bucket
+
+PRIORITY_ALERT, PRIORITY_REPLY, PRIORITY_WELCOME, PRIORITY_LOG = range(4)
+
+PRIORITY_NAMES = ("alert", "reply", "welcome", "log")
+
+# per-channel queue length past which new sends of that class are dropped
+
+SHED_LIMITS = {PRIORITY_WELCOME: 25, PRIORITY_LOG: 5}
+
+outbound_wait = metrics.histogram("bot_outbound_wait_seconds", "Time a send waited in the outbound scheduler", ("class",))
+
+outbound_shed = metrics.counter("bot_outbound_shed_total", "Sends dropped by the outbound scheduler", ("class",))
+
+class ChannelBucket:
+
+    # discord's per-channel send limit, tracked locally as a token bucket
+
+    def __init__(self, rate, per):
+
+        self.rate = rate
+
+        self.per = per
+
+        self.tokens = rate
+
+        self.updated = time.monotonic()
+
+        self.heap = []
+
+        self.wake = asyncio.Event()
+
+        self.draining = False
+
+    def delay(self, priority, reserve):
+
+        # seconds until a send of this priority may go out
+
+        now = time.monotonic()
+
+        self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate / self.per)
+
+        self.updated = now
+
+        need = 1 if priority == PRIORITY_ALERT else 1 + reserve
+
+        return max(0.0, (need - self.tokens) * self.per / self.rate)
+
+class OutboundScheduler:
+
+    def __init__(self, rate, per, reserve, history):
+
+        self.rate = rate
+
+        self.per = per
+
+        self.reserve = reserve
+
+        self.buckets = {}
+
+        self.order = itertools.count()
+
+        self.waits = [deque(maxlen=history) for _ in PRIORITY_NAMES]
+
+    async def send(self, channel, priority, *args, via=None, **kwargs):
+
+        # via: the coroutine doing the actual send (defaults to channel.send); returns None when shed
+
+        bucket = self.buckets.get(channel.id)
+
+        if bucket is None:
+
+            bucket = self.buckets[channel.id] = ChannelBucket(self.rate, self.per)
+
+        limit = SHED_LIMITS.get(priority)
+
+        if limit is not None and sum(1 for item in bucket.heap if item[0] == priority) >= limit:
+
+            outbound_shed.inc(PRIORITY_NAMES[priority])
+
+            return None
+
+        fut = asyncio.get_running_loop().create_future()
+
+        heapq.heappush(bucket.heap, (priority, next(self.order), time.monotonic(), fut, via or channel.send, args, kwargs))
+
+        bucket.wake.set()
+
+        if not bucket.draining:
+
+            bucket.draining = True
+
+            asyncio.get_running_loop().create_task(self.drain(bucket))
+
+        return await fut
+
+    async def drain(self, bucket):
+
+        while bucket.heap:
+
+            wait = bucket.delay(bucket.heap[0][0], self.reserve)
+
+            if wait > 0:
+
+                # a higher-priority send queued meanwhile wakes us to re-check the head
+
+                bucket.wake.clear()
+
+                try:
+
+                    await asyncio.wait_for(bucket.wake.wait(), wait)
+
+                except asyncio.TimeoutError:
+
+                    pass
+
+                continue
+
+            priority, _, queued_at, fut, func, args, kwargs = heapq.heappop(bucket.heap)
+
+            if fut.done():
+
+                # caller gave up waiting
+
+                continue
+
+            bucket.tokens -= 1
+
+            waited = time.monotonic() - queued_at
+
+            outbound_wait.observe(waited, PRIORITY_NAMES[priority])
+
+            self.waits[priority].append(waited)
+
+            try:
+
+                result = await func(*args, **kwargs)
+
+            except Exception as e:
+
+                if not fut.done():
+
+                    fut.set_exception(e)
+
+            else:
+
+                if not fut.done():
+
+                    fut.set_result(result)
+
+        bucket.draining = False
+
+    def wait_summary(self):
+
+        parts = [f"{name} p95 {percentile(waits, 95) * 1000:.0f} ms" for name, waits in zip(PRIORITY_NAMES, self.waits) if waits]
+
+        return " · ".join(parts) or "No sends yet"
+
+outbound = OutboundScheduler(
+
+    config.get("channel_send_rate", DEFAULT_CONFIG["channel_send_rate"]),
+
+    config.get("channel_send_per", DEFAULT_CONFIG["channel_send_per"]),
+
+    config.get("alert_reserve", DEFAULT_CONFIG["alert_reserve"]),
+
+    ping_history
+
+)
+
+class PriorityContext(commands.Context):
+
+    # command replies queue behind CODE alerts in the outbound scheduler
+
+    async def send(self, *args, **kwargs):
+
+        if self.interaction is not None:
+
+            # slash replies go to the interaction webhook, not the channel's bucket, and must answer within 3s
+
+            return await super().send(*args, **kwargs)
+
+        return await outbound.send(self.channel, PRIORITY_REPLY, *args, via=super().send, **kwargs)
+
+# ----------------- DISCORD SETUP -----------------
+
+# point the client at a local Discord stand-in (loadtest.py) instead of discord.com
+
+api_base = config.get("api_base", DEFAULT_CONFIG["api_base"])
+
+gateway_url = config.get("gateway_url", DEFAULT_CONFIG["gateway_url"])
+
+if api_base:
+
+    # interaction callbacks and webhooks build their urls from the same Route
+
+    discord.http.Route.BASE = api_base.rstrip("/")
+
+if gateway_url:
+
+    discord.gateway.DiscordWebSocket.DEFAULT_GATEWAY = yarl.URL(gateway_url)
+
+intents = discord.Intents.default()
+
+intents.guilds = True
+
+intents.members = True
+
+# guild and DM messages are only needed for "!" commands and typed CODE alerts
+
+intents.messages = message_content_intent
+
+intents.message_content = message_content_intent
+
+# every mode except "single" shards the gateway connection
+
+BotBase = commands.Bot if shard_mode == "single" else commands.AutoShardedBot
+
+class Bot(BotBase):
+
+    # set while closing for a restart whose gateway session the next client resumes
+
+    closing_for_resume = False
+
+    resume_target = None
+
+    async def setup_hook(self):
+
+        boot.mark("login")
+
+        # background components are process-wide: the first client starts them, later ones find them running
+
+        await supervisor.start_all()
+
+        await prepare_resume(self)
+
+        # every welcome menu's buttons (including menus sent before a restart) dispatch to this one view
+
+        self.add_view(WelcomeView())
+
+        if CLUSTER_ID == 0:
+
+            # commands are global: one worker registers them for the whole cluster
+
+            asyncio.get_running_loop().create_task(sync_app_commands(self))
+
+    def is_closed(self):
+
+        # keeps connect() from reconnecting once the socket is closed for the handover
+
+        return self.closing_for_resume or super().is_closed()
+
+    async def get_context(self, origin, *, cls=PriorityContext):
+
+        return await super().get_context(origin, cls=cls)
+
+    async def close(self):
+
+        # release the pooled http session together with the gateway, flush pending config writes
+
+        if pending_restart is not None:
+
+            await hand_over_session(self)
+
+        if pending_restart is None or pending_restart[0] != "soft":
+
+            # components outlive a soft restart; any other close ends this process
+
+            await supervisor.stop_all()
+
+        await close_http_session()
+
+        await deletion_queue.flush_all()
+
+        await json_store.flush()
+
+        await super().close()
+
+def build_bot():
+
+    options = {}
+
+    if low_memory_mode:
+
+        options.update(member_cache_flags=discord.MemberCacheFlags.none(), chunk_guilds_at_startup=False, max_messages=None)
+
+    if shard_mode == "cluster":
+
+        options.update(shard_ids=CLUSTER_SHARD_IDS, shard_count=CLUSTER_SHARD_COUNT)
+
+    elif shard_mode == "auto" and config.get("shard_count"):
+
+        options["shard_count"] = config["shard_count"]
+
+    if fast_boot:
+
+        # on_ready no longer waits for every guild's member list; finish_fast_boot() chunks afterwards
+
+        options["chunk_guilds_at_startup"] = False
+
+    return Bot(command_prefix="!", intents=intents, help_command=None, http_trace=rest_trace, **options)
+
+bot = build_bot()
+
+last_self_ping = None
+
+last_restart_time = None
+
+last_restart_reason = None
+
+# ----------------- LOGGING -----------------
+
+LOG_COLORS = {"INFO":0x2ecc71, "COMMAND":0x3498db, "ERROR":0xe74c3c, "RESTART":0xf1c40f, "ROLE":0x9b59b6}
+
+LOG_EMOJIS = {"INFO":"ℹ️","COMMAND":"📝","ERROR":"❌","RESTART":"♻️","ROLE":"🎭"}
+
+# discord limits: 10 embeds per message, 6000 embed characters per message
+
+LOG_BATCH_EMBEDS = 10
+
+LOG_BATCH_CHARS = 5500
+
+log_queue = deque()
+
+log_dropped = Counter()
+
+log_flush_lock = asyncio.Lock()
+
+def log_queue_depth():
+
+    return len(log_queue)
+
+# local sink: recent events in memory, everything in a size-rotated JSONL file written off the loop
+
+log_ring = deque(maxlen=config.get("log_ring_size", DEFAULT_CONFIG["log_ring_size"]))
+
+# ("action", name) / ("actor", id) / ("guild", id) -> the ring's entries for that key, oldest first
+
+log_index = {}
+
+log_file_queue = queue.SimpleQueue()
+
+event_logger = logging.getLogger("bot.events")
+
+event_logger.setLevel(logging.INFO)
+
+event_logger.propagate = False
+
+event_logger.addHandler(logging.handlers.QueueHandler(log_file_queue))
+
+log_file_handler = logging.handlers.RotatingFileHandler(LOG_FILE, maxBytes=config.get("log_file_max_bytes", DEFAULT_CONFIG["log_file_max_bytes"]), backupCount=config.get("log_file_backups", DEFAULT_CONFIG["log_file_backups"]), encoding="utf-8", delay=True)
+
+log_file_listener = logging.handlers.QueueListener(log_file_queue, log_file_handler)
+
+def log_index_keys(entry):
+
+    keys = [("action", entry["action"])]
+
+    if entry["actor_id"]:
+
+        keys.append(("actor", entry["actor_id"]))
+
+    if entry["guild_id"]:
+
+        keys.append(("guild", entry["guild_id"]))
+
+    return keys
+
+def record_log(action, message, actor=None, guild=None):
+
+    entry = {
+
+        "ts": datetime.now(PH_TZ).isoformat(timespec="seconds"),
+
+        "action": action,
+
+        "actor_id": getattr(actor, "id", actor),
+
+        "guild_id": getattr(guild, "id", guild),
+
+        "message": message
+
+    }
+
+    if len(log_ring) == log_ring.maxlen:
+
+        # the ring is about to drop its oldest entry, which is also the oldest in each of its index lists
+
+        evicted = log_ring[0]
+
+        for key in log_index_keys(evicted):
+
+            bucket = log_index.get(key)
+
+            if bucket and bucket[0] is evicted:
+
+                bucket.popleft()
+
+                if not bucket:
+
+                    del log_index[key]
+
+    log_ring.append(entry)
+
+    for key in log_index_keys(entry):
+
+        log_index.setdefault(key, deque()).append(entry)
+
+    event_logger.info(json.dumps(entry, ensure_ascii=False))
+
+def query_logs(action=None, actor_id=None, guild_id=None, limit=10):
+
+    # newest first, straight from memory; walks the shortest matching index list and filters on the rest
+
+    keys = [("action", action), ("actor", actor_id), ("guild", guild_id)]
+
+    keys = [key for key in keys if key[1] is not None]
+
+    if keys:
+
+        source = min((log_index.get(key, ()) for key in keys), key=len)
+
+    else:
+
+        source = log_ring
+
+    out = []
+
+    for entry in reversed(source):
+
+        if action and entry["action"] != action:
+
+            continue
+
+        if actor_id is not None and entry["actor_id"] != actor_id:
+
+            continue
+
+        if guild_id is not None and entry["guild_id"] != guild_id:
+
+            continue
+
+        out.append(entry)
+
+        if len(out) >= limit:
+
+            break
+
+    return out
+
+def start_log_file():
+
+    if log_file_listener._thread is None:
+
+        log_file_listener.start()
+
+def stop_log_file():
+
+    if log_file_listener._thread is not None:
+
+        log_file_listener.stop()
+
+    log_file_handler.close()
+
+async def send_log(message: str, action: str = "INFO", actor=None, guild=None):
+
+    # every event is kept locally; the channel copy is enqueued for log_flusher to batch
+
+    record_log(action, message, actor, guild)
+
+    if not LOG_CHANNEL_ID:
+
+        return
+
+    if len(log_queue) >= log_queue_max:
+
+        # overloaded: count what we drop, the next flush posts a summary instead
+
+        log_dropped[action] += 1
+
+        return
+
+    log_queue.append((action, message, datetime.now(PH_TZ)))
+
+    if len(log_queue) >= LOG_BATCH_EMBEDS and not log_flush_lock.locked():
+
+        # a full batch is waiting, don't sit on it until the next tick
+
+        asyncio.get_running_loop().create_task(flush_logs())
+
+def build_log_embed(action, message, when, count=1):
+
+    emoji = LOG_EMOJIS.get(action, "ℹ️")
+
+    title = f"{emoji} {action} Log" if count == 1 else f"{emoji} {action} Log (x{count})"
+
+    embed = discord.Embed(title=title, description=message[:4000], color=LOG_COLORS.get(action, 0x2ecc71), timestamp=when)
+
+    embed.set_footer(text=f"Logged at {when.strftime('%Y-%m-%d %H:%M:%S')} (PH Time)")
+
+    return embed
+
+def take_log_batch():
+
+    # pop up to one message worth of entries, coalescing identical consecutive entries
+
+    batch = []
+
+    size = 0
+
+    while log_queue and len(batch) < LOG_BATCH_EMBEDS:
+
+        action, message, when = log_queue[0]
+
+        if batch and batch[-1][0] == action and batch[-1][1] == message:
+
+            log_queue.popleft()
+
+            batch[-1][3] += 1
+
+            continue
+
+        cost = min(len(message), 4000) + 80
+
+        if batch and size + cost > LOG_BATCH_CHARS:
+
+            break
+
+        log_queue.popleft()
+
+        batch.append([action, message, when, 1])
+
+        size += cost
+
+    return batch
+
+async def flush_logs():
+
+    async with log_flush_lock:
+
+        ch = bot.get_channel(LOG_CHANNEL_ID)
+
+        if not ch and shard_mode == "cluster" and bot.is_ready():
+
+            # the log channel's guild may sit on another worker's shard; post through REST
+
+            ch = bot.get_partial_messageable(LOG_CHANNEL_ID)
+
+        if not ch:
+
+            # not ready yet (or channel gone): keep entries, the queue is bounded anyway
+
+            return
+
+        if log_dropped:
+
+            total = sum(log_dropped.values())
+
+            detail = ", ".join(f"{a}: {n}" for a, n in log_dropped.items())
+
+            log_dropped.clear()
+
+            log_queue.appendleft(("ERROR", f"⚠️ Log queue overloaded — dropped {total} entries ({detail})", datetime.now(PH_TZ)))
+
+        while log_queue:
+
+            batch = take_log_batch()
+
+            try:
+
+                sent = await outbound.send(ch, PRIORITY_LOG, embeds=[build_log_embed(*entry) for entry in batch])
+
+                if sent is None:
+
+                    # shed by the outbound scheduler; reported with the next overload summary
+
+                    for a, _, _, n in batch:
+
+                        log_dropped[a] += n
+
+                    continue
+
+                now = datetime.now(PH_TZ)
+
+                for _, _, when, count in batch:
+
+                    log_delivery.observe((now - when).total_seconds())
+
+            except:
+
+                # fallback to plain message if embed send fails
+
+                lines = [f"{LOG_EMOJIS.get(a, 'ℹ️')} {a} Log — {m}" + (f" (x{n})" if n > 1 else "") for a, m, _, n in batch]
+
+                try:
+
+                    await outbound.send(ch, PRIORITY_LOG, "\n".join(lines)[:2000])
+
+                except:
+
+                    pass
+
+@tasks.loop(seconds=log_flush_seconds)
+
+async def log_flusher():
+
+    await flush_logs()
+
+# ----------------- AUTO-RESTART -----------------
+
+# event loop run_bot() is running on, so the restart timer thread can hand work to it
+
+main_loop = None
+
+# (mode, reason, delay seconds) set right before the client is closed for a restart
+
+pending_restart = None
+
+def snapshot_cooldowns():
+
+    # command cooldowns live in discord.py's private bucket caches; keep the ones still ticking
+
+    now = time.time()
+
+    out = {}
+
+    for cmd in bot.walk_commands():
+
+        buckets = cmd._buckets
+
+        if not buckets.valid:
+
+            continue
+
+        entries = {str(key): [cd._tokens, cd._window, cd._last] for key, cd in buckets._cache.items() if isinstance(key, int) and now < cd._window + cd.per}
+
+        if entries:
+
+            out[cmd.qualified_name] = entries
+
+    return out
+
+def restore_cooldowns(saved):
+
+    for name, entries in saved.items():
+
+        cmd = bot.get_command(name)
+
+        if cmd is None or not cmd._buckets.valid:
+
+            continue
+
+        for key, (tokens, window, last) in entries.items():
+
+            cd = cmd._buckets._cooldown.copy()
+
+            cd._tokens, cd._window, cd._last = tokens, window, last
+
+            cmd._buckets._cache[int(key)] = cd
+
+def snapshot_runtime_state():
+
+    # in-memory state that should survive a restart (soft or exec)
+
+    state = {
+
+        "saved_at": time.time(),
+
+        "last_restart_time": last_restart_time,
+
+        "last_restart_reason": last_restart_reason,
+
+        "last_self_ping": last_self_ping,
+
+        "ping_latencies": list(ping_latencies),
+
+        "cooldowns": snapshot_cooldowns(),
+
+        "gateway": gateway_session
+
+    }
+
+    write_json_atomic(RUNTIME_STATE_FILE, json.dumps(state, indent=4))
+
+def restore_runtime_state():
+
+    global last_restart_time, last_restart_reason, last_self_ping, gateway_session
+
+    if not os.path.exists(RUNTIME_STATE_FILE):
+
+        return
+
+    state = load_json(RUNTIME_STATE_FILE, {})
+
+    last_restart_time = state.get("last_restart_time")
+
+    last_restart_reason = state.get("last_restart_reason")
+
+    last_self_ping = state.get("last_self_ping")
+
+    ping_latencies.extend(state.get("ping_latencies", []))
+
+    restore_cooldowns(state.get("cooldowns", {}))
+
+    gateway_session = state.get("gateway")
+
+def exec_restart(reason):
+
+    # persist pending config writes and runtime state before the process image is replaced
+
+    json_store.flush_sync()
+
+    snapshot_runtime_state()
+
+    os.environ["BOT_EXEC_AT"] = str(time.time())
+
+    # note: this re-executes the python process (works on most hosts)
+
+    os.execv(sys.executable, [sys.executable] + sys.argv)
+
+def rebuild_bot(old):
+
+    # fresh client (gateway session, http client, cache) with the same commands, hooks and events
+
+    new = build_bot()
+
+    for command in list(old.commands):
+
+        old.remove_command(command.name)
+
+        new.add_command(command)
+
+    # hybrid commands brought their slash halves along; plain app commands (/code) move on their own
+
+    for command in old.tree.get_commands():
+
+        old.tree.remove_command(command.name)
+
+        new.tree.add_command(command)
+
+    new._checks, new._check_once = old._checks, old._check_once
+
+    new._before_invoke, new._after_invoke = old._before_invoke, old._after_invoke
+
+    for name, listeners in old.extra_events.items():
+
+        for listener in listeners:
+
+            new.add_listener(listener, name)
+
+    for name, value in vars(old).items():
+
+        if name.startswith("on_") and asyncio.iscoroutinefunction(value):
+
+            setattr(new, name, value)
+
+    return new
+
+async def restart_bot(reason, delay=0):
+
+    # close the client and let run_bot() restart it (in process or via exec) after `delay` seconds
+
+    global pending_restart, last_restart_time, last_restart_reason
+
+    last_restart_time = ph_time_now()
+
+    last_restart_reason = reason
+
+    embed_cache.invalidate("publicstatus")
+
+    pending_restart = (restart_mode, reason, delay)
+
+    await flush_logs()
+
+    await bot.close()
+
+def restart_process(reason="scheduled restart"):
+
+    # watchdog entry point (runs on the watchdog thread)
+
+    if main_loop is not None and main_loop.is_running():
+
+        future = asyncio.run_coroutine_threadsafe(restart_bot(reason), main_loop)
+
+        try:
+
+            future.result(timeout=60)
+
+            return
+
+        except Exception:
+
+            # the loop is wedged (or the close failed): fall back to re-executing from this thread
+
+            pass
+
+    exec_restart(reason)
+
+# (config key, label, unit scale, unit)
+
+WATCHDOG_CHECKS = (
+
+    ("watchdog_rss_mb", "RSS", 1, "MB"),
+
+    ("watchdog_loop_lag", "loop lag", 1000, "ms"),
+
+    ("watchdog_latency", "gateway latency", 1000, "ms")
+
+)
+
+class RestartWatchdog:
+
+    # samples process health on its own thread so a wedged event loop still gets restarted
+
+    def __init__(self):
+
+        self.armed_at = time.monotonic()
+
+        self.breaches = {}
+
+        self.readings = {}
+
+        self.triggered = False
+
+        self.thread = None
+
+        self.stopping = threading.Event()
+
+    def sample(self):
+
+        now = time.monotonic()
+
+        lag = loop_lag
+
+        if loop_lag_tick is not None:
+
+            # the monitor ticks every second; a silent monitor means the loop itself is stuck
+
+            lag = max(lag, now - loop_lag_tick - 1.5)
+
+        latency = bot.latency
+
+        return {
+
+            "watchdog_rss_mb": rss_bytes() / (1024 * 1024),
+
+            "watchdog_loop_lag": lag,
+
+            "watchdog_latency": latency if math.isfinite(latency) else None
+
+        }
+
+    def check(self):
+
+        # reason to restart now, or None
+
+        now = time.monotonic()
+
+        self.readings = self.sample()
+
+        uptime = now - self.armed_at
+
+        if config.get("restart_interval_enabled", DEFAULT_CONFIG["restart_interval_enabled"]) and uptime >= restart_interval:
+
+            return f"uptime cap of {restart_interval // 60} minutes reached"
+
+        sustain = config.get("watchdog_sustain_seconds", DEFAULT_CONFIG["watchdog_sustain_seconds"])
+
+        settled = uptime >= config.get("watchdog_min_uptime", DEFAULT_CONFIG["watchdog_min_uptime"])
+
+        for key, label, scale, unit in WATCHDOG_CHECKS:
+
+            value, limit = self.readings[key], config.get(key, DEFAULT_CONFIG[key])
+
+            if value is None or not limit or value <= limit:
+
+                self.breaches.pop(key, None)
+
+                continue
+
+            first = self.breaches.setdefault(key, now)
+
+            if settled and now - first >= sustain:
+
+                return f"watchdog: {label} {value * scale:.0f} {unit} over {limit * scale:.0f} {unit} for {now - first:.0f}s"
+
+        return None
+
+    def run(self):
+
+        while not self.stopping.wait(config.get("watchdog_sample_seconds", DEFAULT_CONFIG["watchdog_sample_seconds"])):
+
+            if self.triggered:
+
+                continue
+
+            try:
+
+                reason = self.check()
+
+            except Exception as e:
+
+                print(f"⚠️ Watchdog check failed: {e}")
+
+                continue
+
+            if reason:
+
+                self.triggered = True
+
+                restart_process(reason)
+
+    def arm(self):
+
+        # (re)start the uptime clock after each (re)connect
+
+        self.armed_at = time.monotonic()
+
+        self.breaches.clear()
+
+        self.triggered = False
+
+    def start(self):
+
+        if not self.is_alive():
+
+            self.stopping.clear()
+
+            self.thread = threading.Thread(target=self.run, name="restart-watchdog", daemon=True)
+
+            self.thread.start()
+
+    def stop(self):
+
+        self.stopping.set()
+
+    def is_alive(self):
+
+        return self.thread is not None and self.thread.is_alive()
+
+    def summary(self):
+
+        readings = self.readings or self.sample()
+
+        parts = []
+
+        for key, label, scale, unit in WATCHDOG_CHECKS:
+
+            value, limit = readings[key], config.get(key, DEFAULT_CONFIG[key])
+
+            shown = "n/a" if value is None else f"{value * scale:.0f}"
+
+            flag = " ⚠️" if key in self.breaches else ""
+
+            # a null/0 limit disables the check, as in check()
+
+            cap = f"{limit * scale:.0f} {unit}" if limit else "off"
+
+            parts.append(f"{label}: {shown} / {cap}{flag}")
+
+        return "\n".join(parts)
+
+watchdog = RestartWatchdog()
+
+def schedule_restart():
+
+    watchdog.arm()
+
+def restart_policy_summary():
+
+    if config.get("restart_interval_enabled", DEFAULT_CONFIG["restart_interval_enabled"]):
+
+        return f"Watchdog, at most every {restart_interval // 60} minutes"
+
+    return "Watchdog only (no fixed interval)"
+
+# ----------------- GATEWAY RESUME -----------------
+
+# session handed from the closing client to the next one (through runtime_state.json on exec)
+
+gateway_session = None
+
+async def hand_over_session(client):
+
+    # close with a non-1000 code so discord keeps the session resumable, and remember where it was
+
+    global gateway_session
+
+    ws = client.ws
+
+    if not config.get("resume_sessions", DEFAULT_CONFIG["resume_sessions"]) or shard_mode != "single":
+
+        return
+
+    if ws is None or not ws.open or ws.session_id is None:
+
+        return
+
+    gateway_session = {
+
+        "session_id": ws.session_id,
+
+        "sequence": ws.sequence,
+
+        "resume_url": str(ws.gateway),
+
+        "guild_ids": [g.id for g in client.guilds],
+
+        "saved_at": time.time()
+
+    }
+
+    client.closing_for_resume = True
+
+    await ws.close(code=4000)
+
+async def hydrate_cache(client, guild_ids):
+
+    # a RESUME replays missed events but no READY/GUILD_CREATE; rebuild the guild cache over REST first
+
+    state = client._connection
+
+    for guild_id in guild_ids:
+
+        try:
+
+            data = await client.http.get_guild(guild_id, with_counts=True)
+
+            data["channels"] = await client.http.get_all_guild_channels(guild_id)
+
+            data["members"] = [await client.http.get_member(guild_id, client.user.id)]
+
+        except (discord.NotFound, discord.Forbidden):
+
+            # left or kicked while we were down
+
+            continue
+
+        data["member_count"] = data.get("approximate_member_count")
+
+        state._add_guild_from_data(data)
+
+async def prepare_resume(client):
+
+    global gateway_session
+
+    # one attempt per handed-over session
+
+    session, gateway_session = gateway_session, None
+
+    if not session or shard_mode != "single" or not config.get("resume_sessions", DEFAULT_CONFIG["resume_sessions"]):
+
+        return
+
+    age = time.time() - session["saved_at"]
+
+    if age > config.get("resume_max_age", DEFAULT_CONFIG["resume_max_age"]):
+
+        print(f"ℹ️ Gateway session is {age:.0f}s old; identifying instead of resuming")
+
+        return
+
+    if len(session["guild_ids"]) > config.get("resume_max_guilds", DEFAULT_CONFIG["resume_max_guilds"]):
+
+        return
+
+    try:
+
+        await hydrate_cache(client, session["guild_ids"])
+
+    except discord.HTTPException as e:
+
+        # a READY after IDENTIFY clears whatever made it into the cache
+
+        print(f"⚠️ Cache hydration failed ({e}); identifying instead of resuming")
+
+        return
+
+    client.resume_target = session
+
+original_from_client = discord.gateway.DiscordWebSocket.from_client.__func__
+
+async def from_client_with_resume(cls, client, **kwargs):
+
+    # first connect of a client holding a handed-over session: RESUME instead of IDENTIFY; an
+
+    # invalid session makes discord.py fall back to IDENTIFY on its own
+
+    target = getattr(client, "resume_target", None)
+
+    if kwargs.get("initial") and target:
+
+        client.resume_target = None
+
+        kwargs.update(initial=False, resume=True, session=target["session_id"], sequence=target["sequence"], gateway=yarl.URL(target["resume_url"]))
+
+        client.resumed_handover = True
+
+    return await original_from_client(cls, client, **kwargs)
+
+discord.gateway.DiscordWebSocket.from_client = classmethod(from_client_with_resume)
+
+@bot.event
+
+async def on_resumed():
+
+    # a handed-over session never sees READY; the hydrated cache is the ready state
+
+    if getattr(bot, "resumed_handover", False) and not bot.is_ready():
+
+        bot.resumed_handover = False
+
+        boot.mark("resumed")
+
+        bot._handle_ready()
+
+        bot.dispatch("ready")
+
+        if not low_memory_mode:
+
+            asyncio.get_running_loop().create_task(chunk_guilds())
+
+# ----------------- SELF-PING -----------------
+
+HTTP_TIMEOUT = aiohttp.ClientTimeout(total=15, connect=5, sock_read=10)
+
+http_session = None
+
+# rolling window of self-ping latencies in ms
+
+ping_latencies = deque(maxlen=ping_history)
+
+def get_http_session():
+
+    # one pooled keep-alive session for the whole bot lifetime
+
+    global http_session
+
+    if http_session is None or http_session.closed:
+
+        connector = aiohttp.TCPConnector(limit=10, limit_per_host=4, keepalive_timeout=75, ttl_dns_cache=300)
+
+        http_session = aiohttp.ClientSession(connector=connector, timeout=HTTP_TIMEOUT)
+
+    return http_session
+
+async def close_http_session():
+
+    global http_session
+
+    if http_session is not None and not http_session.closed:
+
+        await http_session.close()
+
+    http_session = None
+
+def percentile(samples, pct):
+
+    if not samples:
+
+        return None
+
+    ordered = sorted(samples)
+
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+def latency_summary(samples):
+
+    if not samples:
+
+        return "No samples yet"
+
+    return f"p50 {percentile(samples, 50):.0f} ms · p95 {percentile(samples, 95):.0f} ms ({len(samples)} pings)"
+
+# ----------------- HEALTH PROBES -----------------
+
+# how often probe_task looks for due probes; each probe keeps its own (jittered, backed-off) schedule
+
+PROBE_CHECK_SECONDS = 5
+
+PROBE_ICONS = {"unknown": "⏳", "up": "✅", "down": "❌", "open": "🔌"}
+
+class Probe:
+
+    def __init__(self, name, url):
+
+        self.name = name
+
+        self.url = url
+
+        # unknown -> up / down; "open" once the circuit breaker trips
+
+        self.state = "unknown"
+
+        self.failures = 0
+
+        self.down_since = None
+
+        self.last_error = None
+
+        self.next_at = 0.0
+
+        self.latencies = ping_latencies if name == "self" else deque(maxlen=ping_history)
+
+    def schedule(self, delay):
+
+        jitter = config.get("probe_jitter", DEFAULT_CONFIG["probe_jitter"])
+
+        self.next_at = time.monotonic() + delay * random.uniform(1 - jitter, 1 + jitter)
+
+def build_probes():
+
+    # the keep-alive URL is always probed; config "probe_targets" adds urls or {"name", "url"} entries
+
+    probes = [Probe("self", REPLIT_URL)]
+
+    for target in config.get("probe_targets", DEFAULT_CONFIG["probe_targets"]):
+
+        if isinstance(target, str):
+
+            probes.append(Probe(yarl.URL(target).host or target, target))
+
+        else:
+
+            probes.append(Probe(target["name"], target["url"]))
+
+    return probes
+
+probes = build_probes()
+
+probe_summary_at = None
+
+async def run_probe(probe):
+
+    global last_self_ping
+
+    interval = config.get("probe_interval", DEFAULT_CONFIG["probe_interval"])
+
+    started = time.perf_counter()
+
+    error = None
+
+    try:
+
+        async with get_http_session().get(probe.url) as resp:
+
+            await resp.read()
+
+            if resp.status >= 500:
+
+                error = f"HTTP {resp.status}"
+
+    except Exception as e:
+
+        error = f"{type(e).__name__}: {e}" if str(e) else type(e).__name__
+
+    if error is None:
+
+        latency = time.perf_counter() - started
+
+        probe_duration.observe(latency, probe.name)
+
+        probe.latencies.append(latency * 1000)
+
+        if probe.name == "self":
+
+            self_ping_duration.observe(latency)
+
+            last_self_ping = ph_time_now()
+
+        previous, failures, down_since = probe.state, probe.failures, probe.down_since
+
+        probe.state, probe.failures, probe.down_since, probe.last_error = "up", 0, None, None
+
+        probe.schedule(interval)
+
+        if previous in ("down", "open"):
+
+            await send_log(f"✅ Probe {probe.name} recovered after {failures} failed check(s), down {(time.time() - down_since) / 60:.0f} min", action="INFO")
+
+        return
+
+    probe.failures += 1
+
+    probe.last_error = error[:100]
+
+    if probe.down_since is None:
+
+        probe.down_since = time.time()
+
+    if probe.failures >= config.get("probe_breaker_failures", DEFAULT_CONFIG["probe_breaker_failures"]):
+
+        # circuit open: one trial per cooldown until it answers again
+
+        cooldown = config.get("probe_breaker_cooldown", DEFAULT_CONFIG["probe_breaker_cooldown"])
+
+        probe.schedule(cooldown)
+
+        if probe.state != "open":
+
+            probe.state = "open"
+
+            await send_log(f"🔌 Probe {probe.name} failed {probe.failures} times; circuit open, next try in {cooldown / 60:.0f} min ({probe.last_error})", action="ERROR")
+
+        return
+
+    probe.schedule(min(config.get("probe_max_backoff", DEFAULT_CONFIG["probe_max_backoff"]), interval * 2 ** (probe.failures - 1)))
+
+    if probe.state != "down":
+
+        probe.state = "down"
+
+        await send_log(f"❌ Probe {probe.name} down: {probe.last_error}", action="ERROR")
+
+def probe_summary():
+
+    lines = []
+
+    for p in probes:
+
+        line = f"{PROBE_ICONS[p.state]} {p.name}: {latency_summary(p.latencies)}"
+
+        if p.last_error:
+
+            line += f" — {p.failures} failed ({p.last_error})"
+
+        lines.append(line)
+
+    return "\n".join(lines)
+
+@tasks.loop(seconds=PROBE_CHECK_SECONDS)
+
+async def probe_task():
+
+    # due probes run concurrently; only state changes and the periodic summary reach the log channel
+
+    global probe_summary_at
+
+    now = time.monotonic()
+
+    due = [p for p in probes if p.next_at <= now]
+
+    if due:
+
+        await asyncio.gather(*(run_probe(p) for p in due))
+
+    every = config.get("probe_summary_minutes", DEFAULT_CONFIG["probe_summary_minutes"]) * 60
+
+    if probe_summary_at is None:
+
+        probe_summary_at = now + every
+
+    elif now >= probe_summary_at:
+
+        probe_summary_at = now + every
+
+        await send_log(f"📡 Probe summary\n{probe_summary()}", action="INFO")
+
+# ----------------- CLUSTER STATS -----------------
+
+def worker_stats():
+
+    if isinstance(bot, commands.AutoShardedBot):
+
+        latencies = bot.latencies
+
+    else:
+
+        latencies = [(bot.shard_id or 0, bot.latency)]
+
+    return {"worker": CLUSTER_ID, "guilds": len(bot.guilds), "latencies": [(sid, lat) for sid, lat in latencies if math.isfinite(lat)]}
+
+@tasks.loop(seconds=config.get("cluster_report_seconds", DEFAULT_CONFIG["cluster_report_seconds"]))
+
+async def cluster_report():
+
+    # every worker publishes its numbers to settings.db so any of them can answer !status
+
+    guild_settings.report_worker(CLUSTER_ID, worker_stats())
+
+    refresh_config()
+
+def cluster_stats():
+
+    if shard_mode != "cluster":
+
+        return [worker_stats()]
+
+    # rows that stopped updating belong to workers that are down
+
+    max_age = 3 * config.get("cluster_report_seconds", DEFAULT_CONFIG["cluster_report_seconds"])
+
+    workers = {w["worker"]: w for w in guild_settings.cluster_workers(max_age)}
+
+    workers[CLUSTER_ID] = worker_stats()
+
+    return [workers[k] for k in sorted(workers)]
+
+def cluster_latency_summary(workers):
+
+    latencies = [lat for w in workers for _, lat in w["latencies"]]
+
+    if not latencies:
+
+        return "Not connected"
+
+    return f"avg {sum(latencies) / len(latencies) * 1000:.0f} ms · worst {max(latencies) * 1000:.0f} ms ({len(latencies)} shard{'s' if len(latencies) != 1 else ''})"
+
+# ----------------- KEEP-ALIVE / HEALTH HTTP SERVER -----------------
+
+# served by aiohttp on the bot's own event loop (no extra thread)
+
+web_runner = None
+
+# aiohttp.web is only needed once the server starts; fast boot imports it then
+
+web = None
+
+def load_web():
+
+    global web
+
+    if web is None:
+
+        from aiohttp import web as aiohttp_web
+
+        web = aiohttp_web
+
+    return web
+
+# how late the loop ran a 0.5s sleep, in seconds; tick is when the monitor last finished
+
+loop_lag = 0.0
+
+loop_lag_tick = None
+
+@tasks.loop(seconds=1)
+
+async def loop_lag_monitor():
+
+    global loop_lag, loop_lag_tick
+
+    loop = asyncio.get_running_loop()
+
+    started = loop.time()
+
+    await asyncio.sleep(0.5)
+
+    loop_lag = max(0.0, loop.time() - started - 0.5)
+
+    loop_lag_tick = time.monotonic()
+
+def gateway_connected():
+
+    if not bot.is_ready() or bot.is_closed():
+
+        return False
+
+    if isinstance(bot, commands.AutoShardedBot):
+
+        shards = bot.shards
+
+        return bool(shards) and not any(shard.is_closed() for shard in shards.values())
+
+    return bot.ws is not None and bot.ws.open
+
+async def http_home(request):
+
+    return web.Response(text="Bot is alive!")
+
+async def http_liveness(request):
+
+    # alive while the event loop keeps up
+
+    ok = loop_lag < config.get("max_loop_lag", DEFAULT_CONFIG["max_loop_lag"])
+
+    return web.json_response({"status": "ok" if ok else "stalled", "loop_lag_ms": round(loop_lag * 1000, 1), "components": supervisor.health()}, status=200 if ok else 503)
+
+async def http_readiness(request):
+
+    # ready once the gateway session is up and the client isn't closing/restarting
+
+    ok = gateway_connected()
+
+    latency = bot.latency if ok else float("nan")
+
+    body = {
+
+        "status": "ready" if ok else "not ready",
+
+        "gateway_connected": ok,
+
+        "gateway_latency_ms": round(latency * 1000, 1) if math.isfinite(latency) else None,
+
+        "loop_lag_ms": round(loop_lag * 1000, 1),
+
+        "guilds": len(bot.guilds) if ok else 0
+
+    }
+
+    return web.json_response(body, status=200 if ok else 503)
+
+async def http_metrics(request):
+
+    return web.Response(text=metrics.render(), headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
+metrics.gauge("bot_guilds", "Guilds the bot is in", lambda: len(bot.guilds))
+
+metrics.gauge("bot_cached_members", "Members held in the member cache", lambda: sum(len(g.members) for g in bot.guilds))
+
+metrics.gauge("bot_log_queue_depth", "send_log entries waiting to be posted", log_queue_depth)
+
+metrics.gauge("bot_gateway_latency_seconds", "Gateway heartbeat latency", lambda: bot.latency)
+
+metrics.gauge("bot_event_loop_lag_seconds", "Event loop lag", lambda: loop_lag)
+
+async def start_web_server():
+
+    global web_runner
+
+    if web_runner is not None:
+
+        return
+
+    load_web()
+
+    app = web.Application()
+
+    app.router.add_get("/", http_home)
+
+    app.router.add_get("/healthz", http_liveness)
+
+    app.router.add_get("/readyz", http_readiness)
+
+    app.router.add_get("/metrics", http_metrics)
+
+    web_runner = web.AppRunner(app, access_log=None)
+
+    await web_runner.setup()
+
+    # cluster workers listen on consecutive ports starting at web_port
+
+    site = web.TCPSite(web_runner, config.get("web_host", DEFAULT_CONFIG["web_host"]), config.get("web_port", DEFAULT_CONFIG["web_port"]) + CLUSTER_ID)
+
+    await site.start()
+
+async def stop_web_server():
+
+    global web_runner
+
+    if web_runner is not None:
+
+        await web_runner.cleanup()
+
+        web_runner = None
+
+if not fast_boot:
+
+    load_web()
+
+# ----------------- PERMISSION HELPERS -----------------
+
+# guild id -> frozenset of allowed staff role ids
+
+staff_roles_index = {}
+
+def staff_roles(guild):
+
+    roles = staff_roles_index.get(guild.id)
+
+    if roles is None:
+
+        settings = guild_settings.get(guild.id)
+
+        allowed = settings["allowed_roles"]
+
+        if any(isinstance(r, str) for r in allowed):
+
+            if guild.unavailable:
+
+                # no roles until the guild comes back; on_guild_available translates then
+
+                return frozenset(r for r in allowed if isinstance(r, int))
+
+            # older settings stored role names; translate them to ids once (unknown names are dropped)
+
+            by_name = {r.name: r.id for r in guild.roles}
+
+            translated = list(dict.fromkeys(r if isinstance(r, int) else by_name[r] for r in allowed if isinstance(r, int) or r in by_name))
+
+            if translated:
+
+                # a translation that matched nothing is kept in memory only, so the names survive for a retry
+
+                settings["allowed_roles"] = translated
+
+                guild_settings.save(guild.id, settings)
+
+            roles = staff_roles_index[guild.id] = frozenset(translated)
+
+            return roles
+
+        roles = staff_roles_index[guild.id] = frozenset(allowed)
+
+    return roles
+
+def invalidate_staff_index(guild_id):
+
+    # role names shown by !config may have changed too
+
+    embed_cache.invalidate_guild(guild_id)
+
+    staff_roles_index.pop(guild_id, None)
+
+def has_staff_role(member):
+
+    if not isinstance(member, discord.Member):
+
+        return False
+
+    # no per-member memo: it would go stale on rejoins, uncached members and missed updates, and the check
+
+    # is one set test against member._roles, the raw role id list discord.py keeps (no Role objects built)
+
+    return not staff_roles(member.guild).isdisjoint(member._roles)
+
+def format_roles(guild, role_ids):
+
+    if not role_ids:
+
+        return "None"
+
+    names = []
+
+    for r in role_ids:
+
+        role = guild.get_role(r) if (guild and isinstance(r, int)) else None
+
+        names.append(role.name if role else str(r))
+
+    return ", ".join(names)
+
+@bot.event
+
+@timed_event
+
+async def on_guild_role_update(before, after):
+
+    # ids survive renames; only drop the index when a staff role itself changed
+
+    if after.id in staff_roles(after.guild):
+
+        invalidate_staff_index(after.guild.id)
+
+@bot.event
+
+@timed_event
+
+async def on_guild_available(guild):
+
+    # guilds unavailable at READY have their roles and channels now; finish their migration and redo the
+
+    # index (and any name translation)
+
+    if guild_settings.migrate_legacy([guild]):
+
+        await send_log(f"📦 Migrated legacy JSON settings into {guild.name}", action="INFO", guild=guild)
+
+    invalidate_staff_index(guild.id)
+
+    staff_roles(guild)
+
+@bot.event
+
+@timed_event
+
+async def on_guild_role_delete(role):
+
+    settings = guild_settings.get(role.guild.id)
+
+    if role.id in settings["allowed_roles"]:
+
+        settings["allowed_roles"].remove(role.id)
+
+        guild_settings.save(role.guild.id, settings)
+
+        invalidate_staff_index(role.guild.id)
+
+async def resolve_member(guild, user_id):
+
+    # cache first, REST fetch only when the member isn't cached (low-memory mode)
+
+    member = guild.get_member(user_id)
+
+    if member is None:
+
+        try:
+
+            member = await guild.fetch_member(user_id)
+
+        except discord.HTTPException:
+
+            return None
+
+    return member
+
+async def is_staff(guild, author):
+
+    if author.id == OWNER_ID:
+
+        return True
+
+    if guild is not None and not isinstance(author, discord.Member):
+
+        author = await resolve_member(guild, author.id)
+
+        if author is None:
+
+            return False
+
+    # guild permission
+
+    if author.guild_permissions.manage_guild:
+
+        return True
+
+    return has_staff_role(author)
+
+def is_staff_check():
+
+    async def predicate(ctx):
+
+        return await is_staff(ctx.guild, ctx.author)
+
+    return commands.check(predicate)
+
+# ----------------- DELETION QUEUE -----------------
+
+# discord bulk-deletes up to 100 messages per call, but only ones younger than 14 days
+
+BULK_DELETE_MAX = 100
+
+BULK_DELETE_MAX_AGE = 14 * 24 * 3600 - 60
+
+class DeletionQueue:
+
+    # per-channel, de-duplicated deletes flushed with one bulk call per window
+
+    def __init__(self, window, remember=2000):
+
+        self.window = window
+
+        self.pending = {}
+
+        self.recent = deque(maxlen=remember)
+
+        self.recent_ids = set()
+
+    def queue(self, message):
+
+        if message.id in self.recent_ids:
+
+            return
+
+        entry = self.pending.get(message.channel.id)
+
+        if entry is None:
+
+            entry = self.pending[message.channel.id] = (message.channel, {})
+
+            asyncio.get_running_loop().create_task(self.flush_later(message.channel.id))
+
+        entry[1][message.id] = None
+
+        if len(entry[1]) >= BULK_DELETE_MAX:
+
+            asyncio.get_running_loop().create_task(self.flush(message.channel.id))
+
+    def remember(self, message_ids):
+
+        for mid in message_ids:
+
+            if len(self.recent) == self.recent.maxlen:
+
+                self.recent_ids.discard(self.recent[0])
+
+            self.recent.append(mid)
+
+            self.recent_ids.add(mid)
+
+    async def flush_later(self, channel_id):
+
+        await asyncio.sleep(self.window)
+
+        await self.flush(channel_id)
+
+    async def flush(self, channel_id):
+
+        entry = self.pending.pop(channel_id, None)
+
+        if entry is None:
+
+            return
+
+        channel, ids = entry
+
+        self.remember(ids)
+
+        now = discord.utils.utcnow()
+
+        fresh, old = [], []
+
+        for mid in ids:
+
+            age = (now - discord.utils.snowflake_time(mid)).total_seconds()
+
+            (fresh if age < BULK_DELETE_MAX_AGE else old).append(mid)
+
+        if not hasattr(channel, "delete_messages"):
+
+            # DMs and other channels without bulk delete
+
+            old += fresh
+
+            fresh = []
+
+        for i in range(0, len(fresh), BULK_DELETE_MAX):
+
+            chunk = fresh[i:i + BULK_DELETE_MAX]
+
+            try:
+
+                await channel.delete_messages([discord.Object(id=mid) for mid in chunk])
+
+            except (discord.Forbidden, discord.NotFound):
+
+                pass
+
+            except discord.HTTPException:
+
+                # a bad id fails the whole bulk call; retry those one by one
+
+                old += chunk
+
+        for mid in old:
+
+            try:
+
+                await bot.http.delete_message(channel.id, mid)
+
+            except discord.HTTPException:
+
+                pass
+
+    async def flush_all(self):
+
+        for channel_id in list(self.pending):
+
+            await self.flush(channel_id)
+
+deletion_queue = DeletionQueue(config.get("delete_window_seconds", DEFAULT_CONFIG["delete_window_seconds"]))
+
+# ----------------- AUTO-DELETE (after invoke) -----------------
+
+@bot.before_invoke
+
+async def _start_command_timer(ctx):
+
+    ctx.metrics_started = time.perf_counter()
+
+    commands_total.inc(ctx.command.qualified_name)
+
+@bot.after_invoke
+
+async def _delete_command_message(ctx):
+
+    command_duration.observe(time.perf_counter() - ctx.metrics_started, ctx.command.qualified_name, "error" if ctx.command_failed else "ok")
+
+    # slash invocations have no chat message to delete (ctx.message is a stand-in carrying the interaction id)
+
+    if ctx.interaction is None and ctx.message:
+
+        deletion_queue.queue(ctx.message)
+
+@bot.event
+
+async def on_command_error(ctx, error):
+
+    if ctx.interaction is None or ctx.interaction.response.is_done():
+
+        return await commands.Bot.on_command_error(bot, ctx, error)
+
+    # an unanswered interaction shows "The application did not respond"; answer privately instead
+
+    if isinstance(error, commands.CheckFailure):
+
+        msg = "❌ You do not have permission to use this command."
+
+    elif isinstance(error, commands.CommandOnCooldown):
+
+        msg = f"⏳ Try again in {error.retry_after:.0f}s."
+
+    else:
+
+        msg = "❌ Something went wrong running this command."
+
+        await commands.Bot.on_command_error(bot, ctx, error)
+
+    await ctx.interaction.response.send_message(msg, ephemeral=True)
+
+# ----------------- MESSAGE DISPATCH -----------------
+
+# first character -> [(prefix variants, handler)]; new triggers plug in here without adding per-message work
+
+PREFIX_HANDLERS = {}
+
+PREFIX_FIRST_CHARS = ()
+
+def register_prefix(prefix, handler, case_insensitive=False):
+
+    global PREFIX_FIRST_CHARS
+
+    variants = {prefix}
+
+    if case_insensitive:
+
+        variants = {"".join(chars) for chars in itertools.product(*[{c.lower(), c.upper()} for c in prefix])}
+
+    variants = tuple(sorted(variants))
+
+    for first in sorted({v[0] for v in variants}):
+
+        PREFIX_HANDLERS.setdefault(first, []).append((variants, handler))
+
+    PREFIX_FIRST_CHARS = tuple(PREFIX_HANDLERS)
+
+def classify_message(content):
+
+    # looks at the leading characters only: no upper()/copy of the content, and plain chatter
+
+    # is rejected by a single startswith against the known first characters
+
+    if not content.startswith(PREFIX_FIRST_CHARS):
+
+        return None
+
+    for variants, handler in PREFIX_HANDLERS[content[0]]:
+
+        if content.startswith(variants):
+
+            return handler
+
+    return None
+
+@bot.event
+
+async def on_message(message):
+
+    if message.author.bot:
+
+        return
+
+    handler = classify_message(message.content)
+
+    if handler is not None:
+
+        # only dispatched messages are timed; plain chatter stays on the allocation-free path
+
+        started = time.perf_counter()
+
+        try:
+
+            await handler(message)
+
+        finally:
+
+            event_duration.observe(time.perf_counter() - started, "on_message")
+
+# also delete any message starting with "!" (non-command fallback)
+
+async def handle_command_message(message):
+
+    # raw '!' messages go through the deletion queue; the after-invoke delete of the same message is de-duplicated
+
+    deletion_queue.queue(message)
+
+    # allow commands to be processed
+
+    await bot.process_commands(message)
+
+# CODE listener (we also keep code detection here)
+
+async def handle_code_message(message):
+
+    parts = message.content.split(":", 1)
+
+    # strip the matched "CODE " prefix whatever its case
+
+    code_part = parts[0][5:].strip().upper()
+
+    note = parts[1].strip() if len(parts) > 1 else None
+
+    if code_part in CODE_MEANINGS:
+
+        # check permission: manage_messages or allowed role
+
+        has_perm = message.author.guild_permissions.manage_messages or has_staff_role(message.author)
+
+        if not has_perm:
+
+            try:
+
+                await outbound.send(message.channel, PRIORITY_REPLY, "❌ You do not have permission to use CODE commands.", delete_after=10)
+
+            except:
+
+                pass
+
+        else:
+
+            embed = code_alert_embed(code_part, note)
+
+            deletion_queue.queue(message)
+
+            if message.reference and message.reference.resolved:
+
+                try:
+
+                    await outbound.send(message.channel, PRIORITY_ALERT, embed=embed, via=message.reference.resolved.reply)
+
+                except:
+
+                    await outbound.send(message.channel, PRIORITY_ALERT, embed=embed)
+
+            else:
+
+                await outbound.send(message.channel, PRIORITY_ALERT, embed=embed)
+
+            code_alerts_total.inc(code_part)
+
+register_prefix(bot.command_prefix, handle_command_message)
+
+register_prefix("CODE ", handle_code_message, case_insensitive=True)
+
+# ----------------- CODE SYSTEM DATA -----------------
+
+CODE_MEANINGS = {
+
+    "BLUE": ("MAY VERIFICATION", 0x3498db, "🔹"),
+
+    "RED": ("PALDO", 0xe74c3c, "🔴"),
+
+    "GREEN": ("NA LOOT NA", 0x2ecc71, "🟢"),
+
+    "YELLOW": ("MAY PAG ASA PA", 0xf1c40f, "🟡"),
+
+    "ORANGE": ("NABUKSAN", 0xe67e22, "🟠"),
+
+    "PURPLE": ("SECURE", 0x9b59b6, "🟣"),
+
+    "BLACK": ("BAN", 0x000000, "⚫")
+
+}
+
+# ----------------- EMBED CACHE -----------------
+
+class CachedEmbed(discord.Embed):
+
+    # serialized once: every send calls to_dict(), which for a frozen embed is the stored payload.
+
+    # cached embeds are shared between sends, so never mutate one after freeze()
+
+    def freeze(self):
+
+        self._frozen = super().to_dict()
+
+        # Embed's slots that are actually set, for with_fields() to copy
+
+        self._set_slots = tuple(name for name in discord.Embed.__slots__ if hasattr(self, name))
+
+        return self
+
+    def to_dict(self):
+
+        frozen = getattr(self, "_frozen", None)
+
+        return frozen if frozen is not None else super().to_dict()
+
+    def with_fields(self, *fields):
+
+        # a few setattrs instead of copy.copy(), which goes through __reduce_ex__ and is several times slower
+
+        e = object.__new__(CachedEmbed)
+
+        for name in self._set_slots:
+
+            setattr(e, name, getattr(self, name))
+
+        e._fields = list(fields)
+
+        e._frozen = {**self._frozen, "fields": e._fields}
+
+        e._set_slots = self._set_slots
+
+        return e
+
+class EmbedCache:
+
+    # static embeds live forever; config-derived ones are dropped when their inputs change
+
+    def __init__(self):
+
+        self.entries = {}
+
+    def get(self, key, build, *args):
+
+        e = self.entries.get(key)
+
+        if e is None:
+
+            e = self.entries[key] = build(*args).freeze()
+
+        return e
+
+    def invalidate(self, key):
+
+        self.entries.pop(key, None)
+
+    def invalidate_guild(self, guild_id):
+
+        self.entries.pop(("config", guild_id), None)
+
+        self.entries.pop(("welcome", guild_id), None)
+
+    def invalidate_config(self):
+
+        # restart policy shows up in !publicstatus and every guild's !config
+
+        self.invalidate("publicstatus")
+
+        for key in [k for k in self.entries if isinstance(k, tuple) and k[0] == "config"]:
+
+            del self.entries[key]
+
+embed_cache = EmbedCache()
+
+def build_code_embed(code):
+
+    meaning, color, emoji = CODE_MEANINGS[code]
+
+    return CachedEmbed(title=f"{emoji} CODE {code}", description=meaning, color=color)
+
+for code in CODE_MEANINGS:
+
+    embed_cache.get(("code", code), build_code_embed, code)
+
+def code_alert_embed(code, note=None):
+
+    # shared, pre-serialized base; a note gets a shallow copy with its one field
+
+    embed = embed_cache.get(("code", code), build_code_embed, code)
+
+    if note:
+
+        formatted = [f"**{w[1:]}**" if w.startswith(":") else w for w in note.split()]
+
+        embed = embed.with_fields({"name": "📝 Note", "value": " ".join(formatted), "inline": False})
+
+    return embed
+
+# how help texts refer to commands: "!" needs message content, "/" always works
+
+HELP_PREFIX = "!" if message_content_intent else "/"
+
+def build_publicstatus_embed():
+
+    lr = f"{last_restart_time} ({last_restart_reason or 'unknown reason'})" if last_restart_time else "No restart recorded yet"
+
+    e = CachedEmbed(title="📊 Public Status", color=0x3498db)
+
+    e.add_field(name="Auto-Restart", value=restart_policy_summary(), inline=False)
+
+    e.add_field(name="Last Restart", value=lr, inline=False)
+
+    return e
+
+def build_config_embed(guild):
+
+    roles = format_roles(guild, guild_cfg(guild)["allowed_roles"])
+
+    e = CachedEmbed(title="⚙️ Bot Configuration", color=0x00ffcc)
+
+    e.add_field(name="Auto-Restart", value=restart_policy_summary(), inline=False)
+
+    e.add_field(name="Allowed Roles", value=roles, inline=False)
+
+    return e
+
+def build_help_embed():
+
+    e = CachedEmbed(title="📖 Help", color=0x00ffcc)
+
+    public = ["status", "publicstatus", "config", "help", "notifier", "welcomemenu"]
+
+    e.add_field(name="Public", value=", ".join(f"`{HELP_PREFIX}{name}`" for name in public) + ", `/code`", inline=False)
+
+    e.set_footer(text=f"Staff commands: use {HELP_PREFIX}staffhelp · every command is also a /slash command")
+
+    return e
+
+def build_notifier_embed():
+
+    e = CachedEmbed(title="📖 CODE Help", description="Available CODE alerts:", color=0x00ffcc)
+
+    for code, (meaning, _, emoji) in CODE_MEANINGS.items():
+
+        e.add_field(name=f"{emoji} CODE {code}", value=meaning, inline=False)
+
+    e.set_footer(text="Usage: CODE <COLOR> : optional note  ·  /code color note" if message_content_intent else "Usage: /code color note")
+
+    return e
+
+STAFF_COMMANDS = {
+
+    "restart": "Manual restart (30s cooldown)",
+
+    "lastrestart": "Show last restart",
+
+    "setrestarttime <min>": "Set max uptime before a restart (5-720, 0 = watchdog only)",
+
+    "showrestarttime": "Show restart policy and watchdog readings",
+
+    "addrole <role>": "Add allowed staff role (name or mention)",
+
+    "removerole <role>": "Remove allowed staff role (name or mention)",
+
+    "listroles": "List allowed staff roles",
+
+    "cheatsheet": "Quick reference",
+
+    "welcomemenu": "Interactive welcome & goodbye menu",
+
+    "memreport": "Memory use and member cache savings",
+
+    "logs [action] [@user] [count]": "Search recent log events",
+
+    "shutdown <minutes?>": "Owner-only timed shutdown"
+
+}
+
+def build_staffhelp_embed():
+
+    e = CachedEmbed(title="🛠️ Staff Help", color=0xffcc00)
+
+    e.add_field(name="Staff Commands", value="\n".join([f"{HELP_PREFIX}{k} → {v}" for k,v in STAFF_COMMANDS.items()]), inline=False)
+
+    return e
+
+def build_cheatsheet_embed():
+
+    e = CachedEmbed(title="📖 Cheatsheet", color=0x7289da)
+
+    e.add_field(name="Commands", value=f"See {HELP_PREFIX}staffhelp for list", inline=False)
+
+    return e
+
+def build_welcome_embed(guild):
+
+    welcome_cfg = guild_cfg(guild)
+
+    e = CachedEmbed(title="👋 Welcome & Goodbye Menu", description="Use the buttons below to configure settings.", color=0x1abc9c)
+
+    e.add_field(name="Current Welcome", value=welcome_cfg.get("welcome_message", DEFAULT_WELCOME["welcome_message"]), inline=False)
+
+    e.add_field(name="Current Goodbye", value=welcome_cfg.get("goodbye_message", DEFAULT_WELCOME["goodbye_message"]), inline=False)
+
+    channel_id = welcome_cfg.get("welcome_channel_id")
+
+    channel_display = f"<#{channel_id}>" if channel_id else "Not Set"
+
+    e.add_field(name="Channel", value=channel_display, inline=False)
+
+    e.add_field(name="Enabled", value=f"Welcome: {welcome_cfg.get('welcome_enabled', True)} | Goodbye: {welcome_cfg.get('goodbye_enabled', True)}", inline=False)
+
+    return e
+
+def guild_key(name, guild):
+
+    # DMs share one entry built from the defaults
+
+    return (name, guild.id if guild else None)
+
+# ----------------- SLASH COMMANDS -----------------
+
+async def sync_app_commands(client):
+
+    # registering commands is rate limited; only push the tree when its definition changed
+
+    # sorted by name: rebuild_bot() re-adds commands in a different order than the first client had them
+
+    commands_by_name = sorted(client.tree.get_commands(), key=lambda c: c.name)
+
+    payload = json.dumps([c.to_dict(client.tree) for c in commands_by_name], sort_keys=True)
+
+    digest = hashlib.sha256(payload.encode()).hexdigest()
+
+    synced = guild_settings.get_meta("app_command_hash") or {}
+
+    if synced.get(str(client.application_id)) == digest:
+
+        return
+
+    try:
+
+        await client.tree.sync()
+
+    except discord.HTTPException as e:
+
+        await send_log(f"⚠️ Slash command sync failed: {e}", action="ERROR")
+
+        return
+
+    synced[str(client.application_id)] = digest
+
+    guild_settings.set_meta("app_command_hash", synced)
+
+    await send_log(f"🔁 Synced {len(client.tree.get_commands())} slash commands", action="INFO")
+
+@bot.tree.command(name="code", description="Send a CODE alert to this channel")
+
+@app_commands.describe(color="Which CODE to raise", note="Optional note; words starting with : are shown in bold")
+
+@app_commands.choices(color=[app_commands.Choice(name=f"{emoji} {code} — {meaning}", value=code) for code, (meaning, _, emoji) in CODE_MEANINGS.items()])
+
+@app_commands.guild_only()
+
+async def code_slash(interaction: discord.Interaction, color: str, note: Optional[str] = None):
+
+    member = interaction.user
+
+    if not (member.guild_permissions.manage_messages or has_staff_role(member)):
+
+        await interaction.response.send_message("❌ You do not have permission to use CODE commands.", ephemeral=True)
+
+        return
+
+    # acknowledge inside discord's 3s window; the alert is the deferred response
+
+    await interaction.response.defer()
+
+    await interaction.followup.send(embed=code_alert_embed(color, note))
+
+    code_alerts_total.inc(color)
+
+# ----------------- BASIC PUBLIC COMMANDS -----------------
+
+@bot.hybrid_command(name="status", description="Bot health, latency and restart info")
+
+async def status_cmd(ctx):
+
+    # cluster stats come from the settings database
+
+    await ctx.defer()
+
+    e = discord.Embed(title="📊 Bot Status", color=0x00ffcc)
+
+    e.add_field(name="Bot Online", value="✅ Yes", inline=False)
+
+    workers = cluster_stats()
+
+    servers = str(sum(w["guilds"] for w in workers))
+
+    if shard_mode == "cluster":
+
+        servers += f" ({len(workers)} workers, this one: {len(bot.guilds)})"
+
+    e.add_field(name="Servers", value=servers, inline=True)
+
+    e.add_field(name="Gateway Latency", value=cluster_latency_summary(workers), inline=True)
+
+    e.add_field(name="Last Self-Ping", value=(last_self_ping or "Never"), inline=True)
+
+    e.add_field(name="Self-Ping Latency", value=latency_summary(ping_latencies), inline=True)
+
+    e.add_field(name="Probes", value=probe_summary()[:1024], inline=False)
+
+    e.add_field(name="Log Queue", value=f"{log_queue_depth()} pending / {log_queue_max} max", inline=True)
+
+    e.add_field(name="Send Wait", value=outbound.wait_summary(), inline=False)
+
+    e.add_field(name="Watchdog", value=watchdog.summary(), inline=True)
+
+    e.add_field(name="Startup", value=boot_report(), inline=False)
+
+    e.add_field(name="Components", value=supervisor.summary(), inline=False)
+
+    e.add_field(name="Last Restart", value=f"{last_restart_time} ({last_restart_reason or 'unknown reason'})" if last_restart_time else "No restart recorded yet", inline=True)
+
+    await ctx.send(embed=e, delete_after=20)
+
+@bot.hybrid_command(name="publicstatus", description="Restart policy and last restart")
+
+async def publicstatus_cmd(ctx):
+
+    await ctx.send(embed=embed_cache.get("publicstatus", build_publicstatus_embed))
+
+    await send_log(f"[{ph_time_now()}] {ctx.author} ran !publicstatus", action="COMMAND", actor=ctx.author, guild=ctx.guild)
+
+@bot.hybrid_command(name="config", description="This server's bot configuration")
+
+async def config_cmd(ctx):
+
+    await ctx.send(embed=embed_cache.get(guild_key("config", ctx.guild), build_config_embed, ctx.guild))
+
+    await send_log(f"[{ph_time_now()}] {ctx.author} ran !config", action="COMMAND", actor=ctx.author, guild=ctx.guild)
+
+# custom help
+
+@bot.hybrid_command(name="help", description="List public commands")
+
+async def help_cmd(ctx):
+
+    await ctx.send(embed=embed_cache.get("help", build_help_embed))
+
+@bot.hybrid_command(name="notifier", description="List the CODE alerts")
+
+async def notifier_cmd(ctx):
+
+    await ctx.send(embed=embed_cache.get("notifier", build_notifier_embed), delete_after=20)
+
+# ----------------- STAFF COMMANDS (full) -----------------
+
+@bot.hybrid_command(name="staffhelp", hidden=True, description="List staff commands")
+
+@is_staff_check()
+
+@app_commands.guild_only()
+
+async def staffhelp_cmd(ctx):
+
+    await ctx.send(embed=embed_cache.get("staffhelp", build_staffhelp_embed), delete_after=25)
+
+    await send_log(f"[{ph_time_now()}] {ctx.author} ran !staffhelp", action="COMMAND", actor=ctx.author, guild=ctx.guild)
+
+@bot.hybrid_command(name="cheatsheet", hidden=True, description="Quick reference")
+
+@is_staff_check()
+
+@app_commands.guild_only()
+
+async def cheatsheet_cmd(ctx):
+
+    await ctx.send(embed=embed_cache.get("cheatsheet", build_cheatsheet_embed), delete_after=20)
+
+    await send_log(f"[{ph_time_now()}] {ctx.author} ran !cheatsheet", action="COMMAND", actor=ctx.author, guild=ctx.guild)
+
+# restart
+
+@bot.hybrid_command(name="restart", hidden=True, description="Restart the bot")
+
+@is_staff_check()
+
+@app_commands.guild_only()
+
+@commands.cooldown(1, 30, commands.BucketType.user)
+
+async def restart_cmd(ctx):
+
+    # no delete_after: its timer would fire after close() shut the http session; the close flushes the queue
+
+    notice = await ctx.send("♻️ Restarting bot...")
+
+    if notice is not None:
+
+        deletion_queue.queue(notice)
+
+    await send_log(f"♻️ Bot restart requested by {ctx.author}", action="RESTART", actor=ctx.author, guild=ctx.guild)
+
+    await restart_bot(f"manual restart by {ctx.author}")
+
+@bot.hybrid_command(name="lastrestart", hidden=True, description="Show the last restart")
+
+@is_staff_check()
+
+@app_commands.guild_only()
+
+@commands.cooldown(1, 30, commands.BucketType.user)
+
+async def lastrestart_cmd(ctx):
+
+    if last_restart_time:
+
+        await ctx.send(f"♻️ Last restart: **{last_restart_time}** ({last_restart_reason or 'unknown reason'})", delete_after=15)
+
+    else:
+
+        await ctx.send("❌ No restart recorded yet.", delete_after=10)
+
+    await send_log(f"[{ph_time_now()}] {ctx.author} ran !lastrestart", action="COMMAND", actor=ctx.author, guild=ctx.guild)
+
+@bot.hybrid_command(name="setrestarttime", hidden=True, description="Set max uptime before a restart (5-720, 0 = watchdog only)")
+
+@is_staff_check()
+
+@app_commands.guild_only()
+
+@app_commands.describe(minutes="5-720, or 0 to leave restarts to the watchdog")
+
+async def setrestarttime_cmd(ctx, minutes: int):
+
+    if minutes != 0 and (minutes < 5 or minutes > 720):
+
+        await ctx.send("❌ Value must be between 5 and 720 minutes (0 turns the fixed interval off).", delete_after=10)
+
+        return
+
+    # the interval is only an upper bound on uptime; the watchdog restarts earlier when unhealthy
+
+    if minutes:
+
+        set_config(restart_interval_enabled=True, restart_interval=minutes * 60)
+
+    else:
+
+        set_config(restart_interval_enabled=False)
+
+    await ctx.send(f"✅ Auto-restart: {restart_policy_summary()}.", delete_after=10)
+
+    await send_log(f"⚙️ Restart policy changed to \"{restart_policy_summary()}\" by {ctx.author}", action="ROLE", actor=ctx.author, guild=ctx.guild)
+
+@bot.hybrid_command(name="showrestarttime", hidden=True, description="Show restart policy and watchdog readings")
+
+@is_staff_check()
+
+@app_commands.guild_only()
+
+async def showrestarttime_cmd(ctx):
+
+    uptime = int(time.monotonic() - watchdog.armed_at) // 60
+
+    lr = f"{last_restart_time} ({last_restart_reason or 'unknown reason'})" if last_restart_time else "No restart recorded yet"
+
+    await ctx.send(f"⏱️ Auto-restart: **{restart_policy_summary()}**\nUptime: {uptime} minutes\n{watchdog.summary()}\nLast restart: {lr}", delete_after=20)
+
+    await send_log(f"[{ph_time_now()}] {ctx.author} ran !showrestarttime", action="COMMAND", actor=ctx.author, guild=ctx.guild)
+
+# addrole / removerole accept mention or name
+
+@bot.hybrid_command(name="addrole", hidden=True, description="Allow a staff role")
+
+@is_staff_check()
+
+@app_commands.guild_only()
+
+@app_commands.describe(role_input="Role mention, id or exact name")
+
+async def addrole_cmd(ctx, *, role_input: str):
+
+    # try mention -> get role by id, else by name (case-insensitive)
+
+    guild = ctx.guild
+
+    role = None
+
+    # role mention or id
+
+    if ctx.message.role_mentions:
+
+        role = ctx.message.role_mentions[0]
+
+    else:
+
+        # try to parse as id (a mention typed into the slash option arrives as text)
+
+        if role_input.strip("<@&>").isdigit():
+
+            role = guild.get_role(int(role_input.strip("<@&>")))
+
+        else:
+
+            # find by name case-insensitive
+
+            for r in guild.roles:
+
+                if r.name.lower() == role_input.lower():
+
+                    role = r
+
+                    break
+
+    if not role:
+
+        await ctx.send("❌ Role not found. Use role mention, id, or exact name.", delete_after=10)
+
+        return
+
+    if role.id in staff_roles(guild):
+
+        await ctx.send(f"❌ Role `{role.name}` already allowed.", delete_after=10)
+
+        return
+
+    settings = guild_cfg(guild)
+
+    settings["allowed_roles"].append(role.id)
+
+    guild_settings.save(guild.id, settings)
+
+    invalidate_staff_index(guild.id)
+
+    await ctx.send(f"✅ Role `{role.name}` added to allowed roles.", delete_after=10)
+
+    await send_log(f"⚙️ {ctx.author} added role `{role.name}` to allowed roles.", action="ROLE", actor=ctx.author, guild=ctx.guild)
+
+@bot.hybrid_command(name="removerole", hidden=True, description="Remove an allowed staff role")
+
+@is_staff_check()
+
+@app_commands.guild_only()
+
+@app_commands.describe(role_input="Role mention, id or exact name")
+
+async def removerole_cmd(ctx, *, role_input: str):
+
+    guild = ctx.guild
+
+    role = None
+
+    if ctx.message.role_mentions:
+
+        role = ctx.message.role_mentions[0]
+
+    else:
+
+        if role_input.strip("<@&>").isdigit():
+
+            role = guild.get_role(int(role_input.strip("<@&>")))
+
+        else:
+
+            for r in guild.roles:
+
+                if r.name.lower() == role_input.lower():
+
+                    role = r
+
+                    break
+
+    if not role or role.id not in staff_roles(guild):
+
+        await ctx.send("❌ Role not in allowed list.", delete_after=10)
+
+        return
+
+    settings = guild_cfg(guild)
+
+    settings["allowed_roles"].remove(role.id)
+
+    guild_settings.save(guild.id, settings)
+
+    invalidate_staff_index(guild.id)
+
+    await ctx.send(f"✅ Role `{role.name}` removed from allowed roles.", delete_after=10)
+
+    await send_log(f"⚙️ {ctx.author} removed role `{role.name}` from allowed roles.", action="ROLE", actor=ctx.author, guild=ctx.guild)
+
+@bot.hybrid_command(name="listroles", hidden=True, description="List allowed staff roles")
+
+@is_staff_check()
+
+@app_commands.guild_only()
+
+async def listroles_cmd(ctx):
+
+    await ctx.send(f"📋 Allowed roles: **{format_roles(ctx.guild, guild_cfg(ctx.guild)['allowed_roles'])}**", delete_after=15)
+
+    await send_log(f"[{ph_time_now()}] {ctx.author} ran !listroles", action="COMMAND", actor=ctx.author, guild=ctx.guild)
+
+@bot.hybrid_command(name="logs", hidden=True, description="Search recent log events")
+
+@is_staff_check()
+
+@app_commands.guild_only()
+
+@app_commands.describe(filters="Any of: action name, @user or user id, count")
+
+async def logs_cmd(ctx, *, filters: str = ""):
+
+    # !logs [action] [@user | user id] [count] — answered from the local ring buffer
+
+    action, actor_id, limit = None, None, 10
+
+    for f in filters.split():
+
+        if f.upper() in LOG_COLORS:
+
+            action = f.upper()
+
+        elif f.strip("<@!>").isdigit() and len(f.strip("<@!>")) >= 15:
+
+            actor_id = int(f.strip("<@!>"))
+
+        elif f.isdigit():
+
+            limit = max(1, min(int(f), 25))
+
+        else:
+
+            await ctx.send(f"❌ Unknown filter `{f}`. Actions: {', '.join(LOG_COLORS)}", delete_after=10)
+
+            return
+
+    # staff see their own server's events only; the bot owner sees every server's
+
+    guild_id = None if ctx.author.id == OWNER_ID else ctx.guild.id
+
+    entries = query_logs(action, actor_id, guild_id, limit)
+
+    lines = [f"`{e['ts'][5:19].replace('T', ' ')}` {LOG_EMOJIS.get(e['action'], 'ℹ️')} {e['message'][:200]}" for e in entries]
+
+    desc = "\n".join(lines) or "No matching entries."
+
+    e = discord.Embed(title=f"🗂️ Recent Logs ({len(entries)})", description=desc[:4000], color=0x95a5a6)
+
+    e.set_footer(text=f"{len(log_ring)} entries in memory · full history in {LOG_FILE}")
+
+    await ctx.send(embed=e, delete_after=30)
+
+# ----------------- MEMORY REPORT -----------------
+
+# rough per-member footprint of discord.py's Member + User objects, used when no measured baseline exists
+
+MEMBER_BYTES_ESTIMATE = 1500
+
+def rss_bytes():
+
+    try:
+
+        with open("/proc/self/status") as f:
+
+            for line in f:
+
+                if line.startswith("VmRSS:"):
+
+                    return int(line.split()[1]) * 1024
+
+    except OSError:
+
+        pass
+
+    # peak rather than current RSS, but better than nothing off Linux
+
+    import resource
+
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def member_counts():
+
+    cached = sum(len(g.members) for g in bot.guilds)
+
+    total = sum(g.member_count or 0 for g in bot.guilds)
+
+    return cached, total
+
+def record_ready_memory():
+
+    # RSS right after ready, per cache mode, so the two modes can be compared across restarts
+
+    cached, total = member_counts()
+
+    baselines = guild_settings.get_meta("rss_at_ready") or {}
+
+    baselines["low" if low_memory_mode else "full"] = {"rss": rss_bytes(), "cached": cached, "total": total, "at": ph_time_now()}
+
+    guild_settings.set_meta("rss_at_ready", baselines)
+
+def memory_report():
+
+    cached, total = member_counts()
+
+    mb = 1024 * 1024
+
+    lines = [
+
+        f"Mode: **{'low-memory' if low_memory_mode else 'full member cache'}**",
+
+        f"RSS now: **{rss_bytes() / mb:.1f} MB**",
+
+        f"Members cached: **{cached:,}** of {total:,}"
+
+    ]
+
+    baselines = guild_settings.get_meta("rss_at_ready") or {}
+
+    for mode, label in (("full", "full cache"), ("low", "low-memory")):
+
+        if mode in baselines:
+
+            b = baselines[mode]
+
+            lines.append(f"RSS at ready ({label}): {b['rss'] / mb:.1f} MB with {b['cached']:,} cached members ({b['at']})")
+
+    if "full" in baselines and "low" in baselines:
+
+        lines.append(f"Measured saving: **{(baselines['full']['rss'] - baselines['low']['rss']) / mb:.1f} MB**")
+
+    else:
+
+        lines.append(f"Estimated saving: **~{max(0, total - cached) * MEMBER_BYTES_ESTIMATE / mb:.1f} MB** ({max(0, total - cached):,} members not cached)")
+
+    return "\n".join(lines)
+
+@bot.hybrid_command(name="memreport", hidden=True, description="Memory use and member cache savings")
+
+@is_staff_check()
+
+@app_commands.guild_only()
+
+async def memreport_cmd(ctx):
+
+    await ctx.defer()
+
+    e = discord.Embed(title="🧠 Memory Report", description=memory_report(), color=0x95a5a6)
+
+    await ctx.send(embed=e, delete_after=30)
+
+    await send_log(f"[{ph_time_now()}] {ctx.author} ran !memreport", action="COMMAND", actor=ctx.author, guild=ctx.guild)
+
+# ----------------- SHUTDOWN (owner only, timed restart) -----------------
+
+@bot.hybrid_command(name="shutdown", hidden=True, description="Owner-only timed shutdown")
+
+@app_commands.guild_only()
+
+@app_commands.describe(minutes="Minutes until the bot comes back")
+
+async def shutdown_cmd(ctx, minutes: Optional[int] = None):
+
+    # owner-only
+
+    if ctx.author.id != OWNER_ID:
+
+        return await ctx.send("❌ Only the bot owner can use this command.", delete_after=10)
+
+    minutes = minutes if (minutes is not None) else config.get("shutdown_default_minutes", shutdown_default_minutes)
+
+    if minutes < 0:
+
+        minutes = 0
+
+    # deleted by the close's final flush, like !restart's notice
+
+    notice = await ctx.send(f"🛑 Shutting down. Bot will attempt to restart in {minutes} minute(s).")
+
+    if notice is not None:
+
+        deletion_queue.queue(notice)
+
+    await send_log(f"🛑 Shutdown initiated by {ctx.author} — restart in {minutes}m", action="RESTART", actor=ctx.author, guild=ctx.guild)
+
+    # close the bot now; run_bot() brings it back after the delay
+
+    await restart_bot(f"shutdown by {ctx.author}", delay=minutes * 60)
+
+@bot.hybrid_command(name="setshutdowntime", hidden=True, description="Set the default shutdown time")
+
+@is_staff_check()
+
+@app_commands.guild_only()
+
+@app_commands.describe(minutes="Default minutes until the bot comes back")
+
+async def setshutdowntime_cmd(ctx, minutes: int):
+
+    set_config(shutdown_default_minutes=max(0, minutes))
+
+    await ctx.send(f"✅ Default shutdown time set to {minutes} minute(s).", delete_after=10)
+
+    await send_log(f"⚙️ {ctx.author} set default shutdown time to {minutes}m", action="ROLE", actor=ctx.author, guild=ctx.guild)
+    
+    
+
+# ----------------- WELCOME / GOODBYE (interactive buttons + fallback commands) -----------------
+
+class WelcomeTextModal(ui.Modal):
+
+    # text input in a modal: no message listener, works without the message content intent
+
+    def __init__(self, key, label, current):
+
+        super().__init__(title=f"Set {label} Message", timeout=300)
+
+        self.key, self.label = key, label
+
+        # same limit as the chat flow allowed; discord rejects the modal if the default is longer than max_length
+
+        self.text = ui.TextInput(label="Message (use {user} and {guild})", style=discord.TextStyle.paragraph, default=current[:MESSAGE_LIMIT], max_length=MESSAGE_LIMIT)
+
+        self.add_item(self.text)
+
+    async def on_submit(self, interaction: discord.Interaction):
+
+        welcome_cfg = guild_cfg(interaction.guild)
+
+        welcome_cfg[self.key] = self.text.value
+
+        guild_settings.save(interaction.guild.id, welcome_cfg)
+
+        await interaction.response.send_message(f"✅ {self.label} message updated.", ephemeral=True)
+
+        await send_log(f"⚙️ {interaction.user} set {self.label.lower()} message", action="COMMAND", actor=interaction.user, guild=interaction.guild)
+
+class WelcomeView(ui.View):
+
+    # persistent: fixed custom_ids and no timeout, registered once per client in setup_hook
+
+    def __init__(self):
+
+        super().__init__(timeout=None)
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+
+        # any staff member may use any menu, not only whoever opened it
+
+        if interaction.guild is None or not await is_staff(interaction.guild, interaction.user):
+
+            await interaction.response.send_message("❌ Only staff can use this menu.", ephemeral=True)
+
+            return False
+
+        return True
+
+    @ui.button(label="Set Welcome Message", style=ButtonStyle.primary, custom_id="welcome:set_welcome")
+
+    async def btn_set_welcome(self, interaction: discord.Interaction, button: ui.Button):
+
+        current = guild_cfg(interaction.guild).get("welcome_message", DEFAULT_WELCOME["welcome_message"])
+
+        await interaction.response.send_modal(WelcomeTextModal("welcome_message", "Welcome", current))
+
+    @ui.button(label="Set Goodbye Message", style=ButtonStyle.danger, custom_id="welcome:set_goodbye")
+
+    async def btn_set_goodbye(self, interaction: discord.Interaction, button: ui.Button):
+
+        current = guild_cfg(interaction.guild).get("goodbye_message", DEFAULT_WELCOME["goodbye_message"])
+
+        await interaction.response.send_modal(WelcomeTextModal("goodbye_message", "Goodbye", current))
+
+    @ui.button(label="Set Welcome Channel (current)", style=ButtonStyle.secondary, custom_id="welcome:set_channel")
+
+    async def btn_set_channel(self, interaction: discord.Interaction, button: ui.Button):
 
         # set the channel where button was clicked
 
-        cid = interaction.channel.id
+        cid = interaction.channel.id
+
+        welcome_cfg = guild_cfg(interaction.guild)
+
+        welcome_cfg["welcome_channel_id"] = cid
+
+        guild_settings.save(interaction.guild.id, welcome_cfg)
+
+        await interaction.response.send_message(f"✅ Welcome/goodbye channel set to {interaction.channel.mention}", ephemeral=True)
+
+        await send_log(f"⚙️ {interaction.user} set welcome/goodbye channel to {interaction.channel}", action="COMMAND", actor=interaction.user, guild=interaction.guild)
+
+    @ui.button(label="Preview Messages", style=ButtonStyle.success, custom_id="welcome:preview")
+
+    async def btn_preview(self, interaction: discord.Interaction, button: ui.Button):
+
+        welcome_cfg = guild_cfg(interaction.guild)
+
+        welcome_text = welcome_cfg.get("welcome_message", DEFAULT_WELCOME["welcome_message"])
+
+        goodbye_text = welcome_cfg.get("goodbye_message", DEFAULT_WELCOME["goodbye_message"])
+
+        e = discord.Embed(title="👋 Preview", color=0x95a5a6)
+
+        e.add_field(name="Welcome", value=welcome_text.format(user=interaction.user.mention, guild=interaction.guild.name), inline=False)
+
+        e.add_field(name="Goodbye", value=goodbye_text.format(user=interaction.user.mention, guild=interaction.guild.name), inline=False)
+
+        await interaction.response.send_message(embed=e, ephemeral=True)
+
+    @ui.button(label="Toggle Welcome/Goodbye", style=ButtonStyle.secondary, custom_id="welcome:toggle")
+
+    async def btn_toggle(self, interaction: discord.Interaction, button: ui.Button):
+
+        welcome_cfg = guild_cfg(interaction.guild)
+
+        welcome_cfg["welcome_enabled"] = not welcome_cfg.get("welcome_enabled", True)
+
+        welcome_cfg["goodbye_enabled"] = not welcome_cfg.get("goodbye_enabled", True)
+
+        guild_settings.save(interaction.guild.id, welcome_cfg)
+
+        state = "ON" if welcome_cfg["welcome_enabled"] else "OFF"
+
+        await interaction.response.send_message(f"🔄 Welcome/Goodbye toggled **{state}**.", ephemeral=True)
+
+        await send_log(f"⚙️ {interaction.user} toggled welcome/goodbye to {state}", action="COMMAND", actor=interaction.user, guild=interaction.guild)
+
+    @ui.button(label="Reset to Default", style=ButtonStyle.danger, custom_id="welcome:reset")
+
+    async def btn_reset(self, interaction: discord.Interaction, button: ui.Button):
+
+        welcome_cfg = guild_cfg(interaction.guild)
+
+        for k, v in DEFAULT_WELCOME.items():
+
+            welcome_cfg[k] = v
+
+        guild_settings.save(interaction.guild.id, welcome_cfg)
+
+        await interaction.response.send_message("♻️ Welcome/goodbye settings reset to default.", ephemeral=True)
+
+        await send_log(f"⚙️ {interaction.user} reset welcome/goodbye settings", action="COMMAND", actor=interaction.user, guild=interaction.guild)
+
+welcome_menu = None
+
+def welcome_menu_buttons():
+
+    # what a sent menu carries: a stopped copy, so discord.py doesn't track a view per message;
+
+    # clicks go to the persistent instance by custom_id
+
+    global welcome_menu
+
+    if welcome_menu is None:
+
+        welcome_menu = WelcomeView()
+
+        welcome_menu.stop()
+
+    return welcome_menu
+
+# Command to open menu
+
+@bot.hybrid_command(name="welcomemenu", description="Interactive welcome & goodbye menu")
+
+@is_staff_check()
+
+@app_commands.guild_only()
 
-        welcome_cfg["welcome_channel_id"] = cid
+async def welcomemenu_cmd(ctx):
 
-        save_json(WELCOME_FILE, welcome_cfg)
+    await ctx.send(embed=embed_cache.get(guild_key("welcome", ctx.guild), build_welcome_embed, ctx.guild), view=welcome_menu_buttons(), delete_after=300)
 
-        await interaction.response.send_message(f"✅ Welcome/goodbye channel set to {interaction.channel.mention}", ephemeral=True)
+# Join/leave burst coalescing
 
-        await send_log(f"⚙️ {interaction.user} set welcome/goodbye channel to {interaction.channel}", action="COMMAND")
+# discord's message length limit
 
-    @ui.button(label="Preview Messages", style=ButtonStyle.success)
+MESSAGE_LIMIT = 2000
 
-    async def btn_preview(self, interaction: discord.Interaction, button: ui.Button):
+class MemberAnnouncer:
 
-        welcome_text = welcome_cfg.get("welcome_message", DEFAULT_WELCOME["welcome_message"])
+    # one message per member under normal traffic; once a channel sees `threshold` joins (or leaves)
 
-        goodbye_text = welcome_cfg.get("goodbye_message", DEFAULT_WELCOME["goodbye_message"])
+    # inside `window` seconds, further ones are collected and posted as one message mentioning many members
 
-        e = discord.Embed(title="👋 Preview", color=0x95a5a6)
+    def __init__(self, threshold, window, flush_delay):
 
-        e.add_field(name="Welcome", value=welcome_text.format(user=interaction.user.mention, guild=interaction.guild.name), inline=False)
+        self.threshold = threshold
 
-        e.add_field(name="Goodbye", value=goodbye_text.format(user=interaction.user.mention, guild=interaction.guild.name), inline=False)
+        self.window = window
 
-        await interaction.response.send_message(embed=e, ephemeral=True)
+        self.flush_delay = flush_delay
 
-    @ui.button(label="Toggle Welcome/Goodbye", style=ButtonStyle.secondary)
+        # (channel id, kind) -> recent event times
 
-    async def btn_toggle(self, interaction: discord.Interaction, button: ui.Button):
+        self.recent = {}
 
-        welcome_cfg["welcome_enabled"] = not welcome_cfg.get("welcome_enabled", True)
+        # (channel id, kind) -> [channel, template, guild name, mentions]
 
-        welcome_cfg["goodbye_enabled"] = not welcome_cfg.get("goodbye_enabled", True)
+        self.pending = {}
 
-        save_json(WELCOME_FILE, welcome_cfg)
+    async def announce(self, channel, kind, template, guild_name, mention):
 
-        state = "ON" if welcome_cfg["welcome_enabled"] else "OFF"
+        key = (channel.id, kind)
 
-        await interaction.response.send_message(f"🔄 Welcome/Goodbye toggled **{state}**.", ephemeral=True)
+        now = time.monotonic()
 
-        await send_log(f"⚙️ {interaction.user} toggled welcome/goodbye to {state}", action="COMMAND")
+        times = self.recent.setdefault(key, deque())
 
-    @ui.button(label="Reset to Default", style=ButtonStyle.danger)
+        times.append(now)
 
-    async def btn_reset(self, interaction: discord.Interaction, button: ui.Button):
+        while now - times[0] > self.window:
 
-        for k, v in DEFAULT_WELCOME.items():
+            times.popleft()
 
-            welcome_cfg[k] = v
+        batch = self.pending.get(key)
 
-        save_json(WELCOME_FILE, welcome_cfg)
+        if batch is not None:
 
-        await interaction.response.send_message("♻️ Welcome/goodbye settings reset to default.", ephemeral=True)
+            batch[3].append(mention)
 
-        await send_log(f"⚙️ {interaction.user} reset welcome/goodbye settings", action="COMMAND")
+            return
 
-# Command to open menu
+        if len(times) < self.threshold:
 
-@bot.command(name="welcomemenu")
+            await outbound.send(channel, PRIORITY_WELCOME, template.format(user=mention, guild=guild_name))
 
-@is_staff_check()
+            return
 
-async def welcomemenu_cmd(ctx):
+        self.pending[key] = [channel, template, guild_name, [mention]]
 
-    view = WelcomeView(ctx.author)
+        asyncio.get_running_loop().create_task(self.flush_later(key))
 
-    e = discord.Embed(title="👋 Welcome & Goodbye Menu", description="Use the buttons below to configure settings.", color=0x1abc9c)
+    async def flush_later(self, key):
 
-    e.add_field(name="Current Welcome", value=welcome_cfg.get("welcome_message", DEFAULT_WELCOME["welcome_message"]), inline=False)
+        await asyncio.sleep(self.flush_delay)
 
-    e.add_field(name="Current Goodbye", value=welcome_cfg.get("goodbye_message", DEFAULT_WELCOME["goodbye_message"]), inline=False)
+        channel, template, guild_name, mentions = self.pending.pop(key)
 
-    channel_id = welcome_cfg.get("welcome_channel_id")
+        for text in self.pack(template, guild_name, mentions):
 
-    channel_display = f"<#{channel_id}>" if channel_id else "Not Set"
+            try:
 
-    e.add_field(name="Channel", value=channel_display, inline=False)
+                await outbound.send(channel, PRIORITY_WELCOME, text)
 
-    e.add_field(name="Enabled", value=f"Welcome: {welcome_cfg.get('welcome_enabled', True)} | Goodbye: {welcome_cfg.get('goodbye_enabled', True)}", inline=False)
+            except discord.HTTPException:
+
+                pass
+
+    @staticmethod
+
+    def pack(template, guild_name, mentions):
+
+        # as many mentions per message as fit in the length limit ({user} may appear more than once)
+
+        base = len(template.format(user="", guild=guild_name))
+
+        per_user = max(1, template.count("{user}"))
+
+        chunks = [[]]
+
+        size = base
+
+        for m in mentions:
+
+            extra = (len(m) + (2 if chunks[-1] else 0)) * per_user
+
+            if chunks[-1] and size + extra > MESSAGE_LIMIT:
+
+                chunks.append([])
+
+                size = base
+
+                extra = len(m) * per_user
+
+            chunks[-1].append(m)
+
+            size += extra
 
-    await ctx.send(embed=e, view=view, delete_after=300)
+        return [template.format(user=", ".join(c), guild=guild_name) for c in chunks]
+
+member_announcer = MemberAnnouncer(
+
+    config.get("join_burst_threshold", DEFAULT_CONFIG["join_burst_threshold"]),
+
+    config.get("join_burst_window", DEFAULT_CONFIG["join_burst_window"]),
+
+    config.get("join_burst_flush_seconds", DEFAULT_CONFIG["join_burst_flush_seconds"])
+
+)
 
 # Events for actual welcome/goodbye
 
 @bot.event
 
+@timed_event
+
 async def on_member_join(member):
 
+    welcome_cfg = guild_settings.get(member.guild.id)
+
     if welcome_cfg.get("welcome_enabled", True) and welcome_cfg.get("welcome_channel_id"):
 
         ch = member.guild.get_channel(welcome_cfg["welcome_channel_id"])
@@ -972,19 +4120,31 @@ async def on_member_join(member):
 
                 msg = welcome_cfg.get("welcome_message", DEFAULT_WELCOME["welcome_message"])
 
-                await ch.send(msg.format(user=member.mention, guild=member.guild.name))
+                await member_announcer.announce(ch, "welcome", msg, member.guild.name, member.mention)
 
             except:
 
                 pass
 
+# raw event: on_member_remove only fires for cached members, which low-memory mode doesn't keep
+
 @bot.event
 
-async def on_member_remove(member):
+@timed_event
+
+async def on_raw_member_remove(payload):
+
+    guild = bot.get_guild(payload.guild_id)
+
+    if guild is None:
+
+        return
+
+    welcome_cfg = guild_settings.get(guild.id)
 
     if welcome_cfg.get("goodbye_enabled", True) and welcome_cfg.get("welcome_channel_id"):
 
-        ch = member.guild.get_channel(welcome_cfg["welcome_channel_id"])
+        ch = guild.get_channel(welcome_cfg["welcome_channel_id"])
 
         if ch:
 
@@ -992,30 +4152,400 @@ async def on_member_remove(member):
 
                 msg = welcome_cfg.get("goodbye_message", DEFAULT_WELCOME["goodbye_message"])
 
-                await ch.send(msg.format(user=member.mention, guild=member.guild.name))
+                await member_announcer.announce(ch, "goodbye", msg, guild.name, payload.user.mention)
 
             except:
 
                 pass
 
+# ----------------- LIFECYCLE SUPERVISOR -----------------
+
+class Component:
+
+    def __init__(self, name, start, stop, running, error, when):
+
+        self.name = name
+
+        self.start = start
+
+        self.stop = stop
+
+        self.running = running
+
+        self.error = error
+
+        self.when = when
+
+        self.wanted = False
+
+        self.started_at = None
+
+        self.failures = 0
+
+        self.restarts = 0
+
+        self.last_error = None
+
+        self.retry_at = None
+
+class Supervisor:
+
+    # owns the background components: each is started once, restarted with backoff if it dies,
+
+    # and stopped in reverse order when the process shuts down
+
+    CHECK_SECONDS = 5
+
+    MAX_BACKOFF = 300
+
+    # a component that stays up this long has its backoff reset
+
+    STABLE_SECONDS = 60
+
+    def __init__(self):
+
+        self.components = []
+
+        self.monitor = None
+
+    def add(self, name, start, stop, running, error=None, when="setup"):
+
+        self.components.append(Component(name, start, stop, running, error or (lambda: None), when))
+
+    def add_loop(self, name, loop, on_stop=None, when="setup"):
+
+        async def stop():
+
+            loop.cancel()
+
+            if on_stop is not None:
+
+                await on_stop()
+
+        def error():
+
+            return loop.get_task().exception() if loop.failed() else None
+
+        self.add(name, loop.start, stop, loop.is_running, error, when)
+
+    @staticmethod
+
+    async def call(func):
+
+        result = func()
+
+        if asyncio.iscoroutine(result):
+
+            await result
+
+    async def launch(self, c):
+
+        try:
+
+            await self.call(c.start)
+
+            c.started_at = time.monotonic()
+
+        except Exception as e:
+
+            self.failed(c, e)
+
+    def failed(self, c, error):
+
+        c.failures += 1
+
+        c.last_error = f"{type(error).__name__}: {error}" if error else "stopped"
+
+        c.retry_at = time.monotonic() + min(self.MAX_BACKOFF, 2 ** c.failures)
+
+    async def start_all(self, when="setup"):
+
+        for c in self.components:
+
+            if c.when == when and not c.wanted:
+
+                c.wanted = True
+
+                if not c.running():
+
+                    await self.launch(c)
+
+        if self.monitor is None or self.monitor.done():
+
+            self.monitor = asyncio.get_running_loop().create_task(self.watch())
+
+    async def watch(self):
+
+        while True:
+
+            await asyncio.sleep(self.CHECK_SECONDS)
+
+            now = time.monotonic()
+
+            for c in self.components:
+
+                if not c.wanted:
+
+                    continue
+
+                if c.running():
+
+                    if c.failures and now - c.started_at >= self.STABLE_SECONDS:
+
+                        c.failures = 0
+
+                    continue
+
+                if c.retry_at is None:
+
+                    self.failed(c, c.error())
+
+                    await send_log(f"⚠️ {c.name} stopped ({c.last_error}); restarting in {c.retry_at - now:.0f}s", action="ERROR")
+
+                elif now >= c.retry_at:
+
+                    c.retry_at = None
+
+                    c.restarts += 1
+
+                    await self.launch(c)
+
+    async def stop_all(self):
+
+        if self.monitor is not None:
+
+            self.monitor.cancel()
+
+            self.monitor = None
+
+        for c in reversed(self.components):
+
+            if not c.wanted:
+
+                continue
+
+            c.wanted = False
+
+            try:
+
+                await self.call(c.stop)
+
+            except Exception as e:
+
+                print(f"⚠️ Stopping {c.name} failed: {e}")
+
+    def health(self):
+
+        return {c.name: {"running": bool(c.running()), "restarts": c.restarts, "last_error": c.last_error} for c in self.components if c.wanted}
+
+    def summary(self):
+
+        now = time.monotonic()
+
+        parts = []
+
+        for c in self.components:
+
+            if not c.wanted:
+
+                continue
+
+            if c.running():
+
+                parts.append(f"✅ {c.name}" + (f" ({c.restarts} restarts)" if c.restarts else ""))
+
+            else:
+
+                retry = f", retry in {max(0, c.retry_at - now):.0f}s" if c.retry_at else ""
+
+                parts.append(f"❌ {c.name} ({c.last_error or 'starting'}{retry})")
+
+        return "\n".join(parts) or "Not started"
+
+supervisor = Supervisor()
+
+# start order; shutdown runs backwards (loggers stop and flush before the watchdog and web server go)
+
+supervisor.add("log file", start_log_file, stop_log_file, lambda: log_file_listener._thread is not None)
+
+supervisor.add_loop("loop lag monitor", loop_lag_monitor)
+
+supervisor.add("web server", start_web_server, stop_web_server, lambda: web_runner is not None, when="ready" if fast_boot else "setup")
+
+supervisor.add("restart watchdog", watchdog.start, watchdog.stop, watchdog.is_alive)
+
+supervisor.add_loop("log flusher", log_flusher, on_stop=flush_logs)
+
+if CLUSTER_ID == 0:
+
+    # the keep-alive URL points at the first worker; one prober is enough
+
+    supervisor.add_loop("probes", probe_task)
+
+if shard_mode == "cluster":
+
+    supervisor.add_loop("cluster report", cluster_report)
+
 # ----------------- BOT START -----------------
 
+BOOT_HISTORY = 20
+
+def record_boot():
+
+    # keep recent boot times per mode so fast boot's effect stays visible
+
+    history = guild_settings.get_meta("boot_history") or []
+
+    history.append({"kind": boot.kind, "fast": fast_boot, "total": round(boot.total, 3), "at": ph_time_now()})
+
+    guild_settings.set_meta("boot_history", history[-BOOT_HISTORY:])
+
+    return history
+
+def boot_report(history=None):
+
+    lines = [f"{boot.kind}: **{boot.total:.2f}s** to ready" if boot.done else f"{boot.kind}: not ready yet", boot.summary()]
+
+    history = history if history is not None else guild_settings.get_meta("boot_history") or []
+
+    # cold/exec starts only; soft restarts skip the interpreter and imports
+
+    totals = {mode: [h["total"] for h in history if h["fast"] == mode and h["kind"] != "soft restart"] for mode in (False, True)}
+
+    if totals[False] and totals[True]:
+
+        normal, fast = percentile(totals[False], 50), percentile(totals[True], 50)
+
+        lines.append(f"Median start: fast boot {fast:.2f}s vs normal {normal:.2f}s ({(normal - fast) / normal * 100:.0f}% faster)")
+
+    return "\n".join(lines)
+
+async def chunk_guilds():
+
+    for guild in bot.guilds:
+
+        if not guild.chunked:
+
+            await guild.chunk()
+
+async def finish_fast_boot():
+
+    # work fast boot moved off the path to on_ready
+
+    await supervisor.start_all("ready")
+
+    if not low_memory_mode:
+
+        await chunk_guilds()
+
+@bot.event
+
+async def on_connect():
+
+    boot.mark("gateway connected")
+
 @bot.event
 
+@timed_event
+
 async def on_ready():
 
+    if boot.mark("ready"):
+
+        await send_log(f"🚀 Startup timeline\n{boot_report(record_boot())}", action="INFO")
+
+        if fast_boot:
+
+            asyncio.get_running_loop().create_task(finish_fast_boot())
+
     await send_log(f"✅ Bot is online as {bot.user}", action="INFO")
 
-    self_ping_task.start()
+    migrated = guild_settings.migrate_legacy(bot.guilds)
+
+    if migrated:
+
+        await send_log(f"📦 Migrated legacy JSON settings into {migrated} guild(s)", action="INFO")
 
-    keep_alive()
+    # precompute the staff role index (and convert any name-based settings to role ids)
+
+    for guild in bot.guilds:
+
+        if not guild.unavailable:
+
+            staff_roles(guild)
+
+    record_ready_memory()
 
     print(f"Bot online as {bot.user}")
 
-if TOKEN:
+async def run_bot():
+
+    global bot, main_loop, pending_restart, boot
+
+    main_loop = asyncio.get_running_loop()
+
+    try:
+
+        while True:
+
+            async with bot:
+
+                await bot.start(TOKEN)
+
+            if pending_restart is None:
+
+                return
+
+            mode, reason, delay = pending_restart
+
+            pending_restart = None
+
+            if delay:
+
+                await asyncio.sleep(delay)
+
+            if mode != "soft":
+
+                await supervisor.stop_all()
+
+                exec_restart(reason)
+
+            # soft restart: same process, imports and state; only the client is rebuilt
+
+            boot = BootTimeline("soft restart", time.time())
+
+            snapshot_runtime_state()
+
+            bot = rebuild_bot(bot)
 
-    bot.run(TOKEN)
+            boot.mark("client rebuilt")
 
-else:
+            schedule_restart()
+
+    finally:
+
+        await supervisor.stop_all()
+
+boot.mark("module setup")
+
+if __name__ == "__main__":
+
+    if TOKEN:
+
+        restore_runtime_state()
+
+        schedule_restart()
+
+        discord.utils.setup_logging()
+
+        try:
+
+            asyncio.run(run_bot())
+
+        except KeyboardInterrupt:
+
+            pass
+
+    else:
 
-    print("❌ No token found in token.txt") 
\ No newline at end of file
+        print("❌ No token found in token.txt") 
\ No newline at end of file